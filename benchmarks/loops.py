@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+Compare the throughput of the test providers served with each event loop.
+
+    $ python benchmarks/loops.py --requests 20000 --concurrency 50
+
+The application is served in a child process by :meth:`Hypr.run` and loaded
+by a client running in the parent process with the default event loop.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from hypr import Hypr
+from hypr.server import new_event_loop
+from test_tools import ProviderTemplate, cp_provider_factory
+
+
+PATHS = '/plain', '/plain/0', '/checkpoint/0'
+
+
+def make_app(event_loop):
+
+    app = Hypr(loop=event_loop)
+    app.router.add_provider(type('Plain', (ProviderTemplate,), {}),
+                            '/plain', '/plain/<int:value>')
+    app.router.add_provider(cp_provider_factory(), '/checkpoint/<int:value>')
+    return app
+
+
+def unused_port():
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=10.0):
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('the server did not start')
+
+
+@asyncio.coroutine
+def load(loop, port, requests, concurrency):
+
+    connector = aiohttp.TCPConnector(loop=loop)
+    urls = ['http://127.0.0.1:{}{}'.format(port, path) for path in PATHS]
+    remaining = [requests]
+
+    @asyncio.coroutine
+    def client():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            url = urls[remaining[0] % len(urls)]
+            resp = yield from aiohttp.request('GET', url, connector=connector,
+                                              loop=loop)
+            yield from resp.read()
+            assert resp.status == 200, resp.status
+
+    start = loop.time()
+    yield from asyncio.wait([client() for _ in range(concurrency)], loop=loop)
+    elapsed = loop.time() - start
+
+    connector.close()
+    return requests / elapsed
+
+
+def bench(event_loop, requests, concurrency):
+
+    new_event_loop(event_loop).close()      # fail early if not installed
+
+    port = unused_port()
+    pid = os.fork()
+    if not pid:
+        try:
+            make_app(event_loop).run(port=port, event_loop=event_loop)
+        finally:
+            os._exit(0)
+
+    try:
+        wait_for(port)
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(
+                load(loop, port, requests, concurrency))
+        finally:
+            loop.close()
+    finally:
+        os.kill(pid, signal.SIGINT)
+        os.waitpid(pid, 0)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--loops', default='asyncio,uvloop')
+    args = parser.parse_args()
+
+    for name in args.loops.split(','):
+        try:
+            rate = bench(name, args.requests, args.concurrency)
+        except ImportError as exc:
+            print('{:<10} skipped ({})'.format(name, exc))
+            continue
+        print('{:<10} {:>10.0f} req/s'.format(name, rate))
+
+
+if __name__ == '__main__':
+    main()
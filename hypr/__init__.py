@@ -7,12 +7,13 @@ Hypr
 """
 
 from hypr.app import Hypr
-from hypr.provider import Provider, checkpoint, filter
+from hypr.provider import Provider, CheckpointCache, checkpoint, filter
 from hypr.globals import request
+from hypr.metrics import Metrics
 from hypr.web_exceptions import abort, redirect
 from aiohttp.web import Response
 
 
 __version__ = '0.7.0'
-__all__ = ['Hypr', 'Provider', 'Response', 'checkpoint', 'filter', 'request',
-           'abort', 'redirect']
+__all__ = ['Hypr', 'Provider', 'CheckpointCache', 'Metrics', 'Response',
+           'checkpoint', 'filter', 'request', 'abort', 'redirect']
@@ -16,6 +16,8 @@ from hypr.config import Config
 from hypr.request import RequestHandler, Request
 from hypr.dispatcher import Dispatcher
 from hypr.globals import LocalStorage
+from hypr.limits import Limiter
+from hypr.server import Prefork, new_event_loop
 from hypr.testing import TestClient
 
 
@@ -29,16 +31,36 @@ class Hypr(Application):
     config_class = Config
     request_class = Request
 
+    #: maximum number of middleware chains kept by the application
+    MAX_CHAINS = 1024
+
+    #: the :class:`~hypr.metrics.Metrics` collected, `None` when disabled
+    metrics = None
+
     # Default configuration parameters
     default_config = {
         'MODELS_SQLALCHEMY_DEFAULT_SERVER':     'sqlite:///:memory:',
         'COLLECTION_DEFAULT_MAX':               10,
         'COLLECTION_ABSOLUTE_MAX':              100,
+        'DISPATCHER_CACHE_MAX':                 0,
+        'EVENT_LOOP':                           None,
+        'SERVER_TIMING':                        False,
+        'MAX_CONCURRENCY':                      None,
+        'MAX_QUEUE':                            0,
+        'RETRY_AFTER':                          1,
     }
 
     def __init__(self, *, logger=None, loop=None, router=None,
                  handler_factory=None, middlewares=None):
 
+        # the loop can be an implementation name (see `new_event_loop`), the
+        # loops created by the application are closed by it when replaced
+        self._loop_name = None
+        self._own_loop = isinstance(loop, str)
+        if self._own_loop:
+            self._loop_name, loop = loop, new_event_loop(loop)
+            asyncio.set_event_loop(loop)
+
         kwargs = {'logger': logger,
                   'loop': loop or asyncio.get_event_loop(),
                   'router': router or Dispatcher(),
@@ -50,22 +72,134 @@ class Hypr(Application):
         LocalStorage.bind(self)
         self.config = self.config_class(defaults=self.default_config)
 
-    def propagate(self):
+        self.timing_hooks = []
+
+        self._limiter = None
+
+        self._chains = {}
+        self._chained = ()
+        self._propagated = False
+
+    @asyncio.coroutine
+    def compose_middlewares(self, handler):
+        """
+        Return the handler wrapped by the middlewares of the application.
+
+        The chain of middlewares is composed once per handler and reused for
+        the next requests. The chains are composed again when
+        :attr:`middlewares` changes.
+        """
+
+        middlewares = tuple(self._middlewares)
+        if middlewares != self._chained:
+            self._chains.clear()
+            self._chained = middlewares
+
+        rv = self._chains.get(handler)
+        if rv is None:
+
+            rv = handler
+            for factory in reversed(middlewares):
+                rv = yield from factory(self, rv)
+
+            # keep the cache bounded when the handlers are not reused
+            if len(self._chains) >= self.MAX_CHAINS:
+                self._chains.clear()
+            self._chains[handler] = rv
+
+        return rv
+
+    @property
+    def limiter(self):
+        """
+        The :class:`~hypr.limits.Limiter` of the requests processed by the
+        providers, built on first use from the ``MAX_CONCURRENCY`` and
+        ``MAX_QUEUE`` configuration values. `None` when not limited.
+
+        The requests exceeding the queue are rejected with a ``503 Service
+        Unavailable`` error and a ``Retry-After`` header of ``RETRY_AFTER``
+        seconds.
+        """
 
-        self.router.propagate(self)
+        if self._limiter is None and \
+                self.config['MAX_CONCURRENCY'] is not None:
+            self._limiter = Limiter(self.config['MAX_CONCURRENCY'],
+                                    self.config['MAX_QUEUE'])
+        return self._limiter
+
+    def timing_hook(self, func):
+        """
+        Register a function called with the request and its
+        :class:`~hypr.timing.Timings` once the response is written. Usable as
+        a decorator.
+
+        The timings are recorded when a hook is registered or when the
+        ``SERVER_TIMING`` configuration value is set, the latter also sends
+        them in a ``Server-Timing`` header (without the writing of the
+        response, measured once the headers are sent).
+        """
+
+        self.timing_hooks.append(func)
+        return func
+
+    def _set_loop(self, loop):
+
+        # Replace the event loop of the application before it runs by a loop
+        # it created. The previous loop is closed if the application created
+        # it too, a loop supplied by the caller is left to the caller.
+
+        if self._own_loop and not self._loop.is_closed():
+            self._loop.close()
+
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._own_loop = True
+        LocalStorage.bind(self)
+
+    def propagate(self, lazy=False):
+
+        self.router.propagate(self, lazy=lazy)
+        self._propagated = True
 
     def test_client(self):
 
         return TestClient(self)
 
-    def run(self, host=None, port=None, debug=None, **options):
+    def run(self, host=None, port=None, debug=None, workers=1,
+            reuse_port=False, graceful_timeout=10.0, event_loop=None,
+            **options):
         """
         Run the application on a local server.
+
+        With more than one worker, the application is served by a pool of
+        pre-forked processes (see :class:`hypr.server.Prefork`). `reuse_port`
+        makes each worker bind its own socket with ``SO_REUSEPORT`` and
+        `graceful_timeout` is the delay given to the workers to finish their
+        in-flight requests when stopped. Sending ``SIGHUP`` to the server
+        reloads the configuration and replaces the workers without downtime.
+
+        `event_loop` selects the implementation of the event loop (see
+        :func:`hypr.server.new_event_loop`), the ``EVENT_LOOP`` configuration
+        value is used by default. If none is set, the loop of the application
+        is kept.
         """
 
-        loop = self.loop
         host = host or '127.0.0.1'
         port = port or 5555
+        event_loop = event_loop or self.config['EVENT_LOOP']
+
+        if workers > 1:
+            Prefork(self, host, port, workers, reuse_port=reuse_port,
+                    graceful_timeout=graceful_timeout,
+                    event_loop=event_loop or self._loop_name or 'asyncio'
+                    ).run()
+            return
+
+        if event_loop is not None and event_loop != self._loop_name:
+            self._set_loop(new_event_loop(event_loop))
+            self._loop_name = event_loop
+
+        loop = self.loop
 
         handler = self.make_handler()
         f = loop.create_server(handler, host, port)
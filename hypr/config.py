@@ -16,6 +16,7 @@ class Config(dict):
     def __init__(self, root_path=None, defaults=None):
         dict.__init__(self, defaults or {})
         self.root_path = root_path or '.'
+        self.sources = []
 
     def from_envvar(self, variable_name, silent=False):
         """
@@ -40,12 +41,12 @@ class Config(dict):
 
         err_msg = 'Unable to load configuration file ({})'
 
-        filename = os.path.join(self.root_path, filename)
+        path = os.path.join(self.root_path, filename)
         d = types.ModuleType('config')
-        d.__file__ = filename
+        d.__file__ = path
         try:
-            with open(filename) as config_file:
-                exec(compile(config_file.read(), filename, 'exec'), d.__dict__)
+            with open(path) as config_file:
+                exec(compile(config_file.read(), path, 'exec'), d.__dict__)
         except IOError as e:
             if silent:
                 return False
@@ -53,6 +54,18 @@ class Config(dict):
             raise
         self.from_object(d)
 
+        if filename not in self.sources:
+            self.sources.append(filename)
+
+    def reload(self):
+        """
+        Read again the configuration files loaded with :meth:`from_pyfile` or
+        :meth:`from_envvar`.
+        """
+
+        for filename in self.sources:
+            self.from_pyfile(filename)
+
     def from_object(self, obj):
 
         for key in dir(obj):
@@ -17,6 +17,7 @@ class BaseConverter:
 
     regex = '[^/]+'
     weight = 100
+    part_isolating = True   # the regex never matches a slash
 
     def to_python(self, value):
         return value
@@ -65,6 +66,7 @@ class AnyConverter(BaseConverter):
 
         super().__init__()
         self.regex = '(?:%s)' % '|'.join([re.escape(x) for x in items])
+        self.part_isolating = not any('/' in x for x in items)
 
 
 class PathConverter(BaseConverter):
@@ -77,6 +79,7 @@ class PathConverter(BaseConverter):
 
     regex = '[^/].*?'
     weight = 200
+    part_isolating = False
 
 
 class NumberConverter(BaseConverter):
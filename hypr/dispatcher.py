@@ -9,13 +9,18 @@ hypr.dispatcher
 
 import asyncio
 import re
+from bisect import bisect_right
+from collections import namedtuple, OrderedDict
+from functools import partial
 from aiohttp import hdrs
 from aiohttp.abc import AbstractRouter, AbstractMatchInfo
 from aiohttp.protocol import HttpVersion11
 from hypr.web_exceptions import HTTPMethodNotAllowed, HTTPNotFound, \
-                                HTTPInternalServerError, HTTPTemporaryRedirect
+                                HTTPInternalServerError, HTTPTemporaryRedirect, \
+                                HTTPOk
 from aiohttp.web import Response
 from hypr.converters import DEFAULT_CONVERTERS
+from hypr.helpers import _rule_mpxing
 from hypr.provider import Provider
 from hypr.globals import LocalStorage
 from hypr.serializers import json_serializer
@@ -144,54 +149,67 @@ def _defaultExpectHandler(request):
         request.transport.write(b'HTTP/1.1 100 Continue\r\n\r\n')
 
 
-class MatchInfo(dict, AbstractMatchInfo):
+def _response_handler(provider):
 
-    def __init__(self, match_dict, rule, provider):
-        super().__init__(match_dict)
-        self._provider = provider
-        self._rule = rule
+    # The handler processing the requests with a provider and building the
+    # response from the returned value.
 
-    @property
-    def route(self):
-        return self._rule
+    def ensure_response(request):
 
-    @property
-    def handler(self):
+        rv = yield from provider.local_dispatcher(request)
 
-        def ensure_response(request):
+        status_or_headers = headers = None
+        if isinstance(rv, tuple):
+            rv, status_or_headers, headers = rv + (None,) * (3 - len(rv))
 
-            rv = yield from self._provider.local_dispatcher(request)
+        if rv is None:
+            raise HTTPInternalServerError()
 
-            status_or_headers = headers = None
-            if isinstance(rv, tuple):
-                rv, status_or_headers, headers = rv + (None,) * (3 - len(rv))
+        if isinstance(status_or_headers, (list, dict)):
+            headers, status_or_headers = status_or_headers, None
 
-            if rv is None:
-                raise HTTPInternalServerError()
+        if not isinstance(rv, Response):
 
-            if isinstance(status_or_headers, (list, dict)):
-                headers, status_or_headers = status_or_headers, None
+            data = rv
 
-            if not isinstance(rv, Response):
+            rv = Response(headers=headers, status=status_or_headers or 200,
+                          content_type='application/json')
 
-                data = rv
+            with request.m_timings.measure('serialize'):
+                rv.text = json_serializer(data)
+            headers = status_or_headers = None
 
-                rv = Response(headers=headers, status=status_or_headers or 200,
-                              content_type='application/json')
+        if status_or_headers is not None:
+            if isinstance(status_or_headers, int):
+                rv.status = status_or_headers
 
-                rv.text = json_serializer(data)
-                headers = status_or_headers = None
+        if headers:
+            rv.headers.extend(headers)
 
-            if status_or_headers is not None:
-                if isinstance(status_or_headers, int):
-                    rv.status = status_or_headers
+        return rv
 
-            if headers:
-                rv.headers.extend(headers)
+    return ensure_response
 
-            return rv
 
-        return ensure_response
+class MatchInfo(dict, AbstractMatchInfo):
+
+    def __init__(self, match_dict, rule, provider, handler=None):
+        super().__init__(match_dict)
+        self._provider = provider
+        self._rule = rule
+        self._handler = handler
+
+    @property
+    def route(self):
+        return self._rule
+
+    @property
+    def handler(self):
+
+        # the dispatcher supplies a handler built once per provider
+        if self._handler is None:
+            self._handler = _response_handler(self._provider)
+        return self._handler
 
     def __repr__(self):
         return "<MatchInfo {}: {}>".format(super().__repr__(), self.rule)
@@ -219,14 +237,19 @@ class Rule:
         self.arguments = set()
         self.is_leaf = not url.endswith('/')
         self._trace = self._converters = self._regex = None
+        self._segments = None
+        self._greedy = False
+        self._rank = None
 
     def compile(self):
         """Compiles the regular expression and stores it."""
 
         self._trace = []
         self._converters = {}
+        self._segments = []
 
         regex_parts = []
+        segments = [[]]
 
         def _build_regex(rule):
 
@@ -234,6 +257,10 @@ class Rule:
                 if converter is None:
                     regex_parts.append(re.escape(variable))
                     self._trace.append((False, variable))
+
+                    head, *tail = variable.split('/')
+                    segments[-1].append((None, head))
+                    segments.extend([(None, part)] for part in tail)
                 else:
                     if arguments:
                         c_args, c_kwargs = parse_converter_args(arguments)
@@ -247,6 +274,8 @@ class Rule:
                     self._trace.append((True, variable))
                     self.arguments.add(str(variable))
 
+                    segments[-1].append((convobj, variable))
+
         _build_regex(self.is_leaf and self.url or self.url.rstrip('/'))
         if not self.is_leaf:
             self._trace.append((False, '/'))
@@ -258,6 +287,43 @@ class Rule:
 
         self._regex = re.compile(regex, re.UNICODE)
 
+        # Split the rule in path segments for the routing tree. The first
+        # segment is the empty string before the leading slash. Static
+        # segments are kept as plain strings while the others are compiled
+        # into a regex matching exactly one segment. If a converter is able
+        # to match a slash (e.g. `path`), the segmentation stops and the rule
+        # is flagged as greedy: it has to be matched against the whole path.
+        self._greedy = False
+        for parts in segments[1:]:
+            if all(c is None for c, _ in parts):
+                self._segments.append(''.join(v for _, v in parts))
+                continue
+            if not all(c is None or c.part_isolating for c, _ in parts):
+                self._greedy = True
+                break
+            weight = tuple(c.weight for c, _ in parts if c is not None)
+            pattern = ''.join(
+                re.escape(v) if c is None else '(?P<{}>{})'.format(v, c.regex)
+                for c, v in parts)
+            self._segments.append((weight, pattern))
+
+    def capture(self, path):
+        """
+        Check if the rule regex matches a given path without converting the
+        values.
+
+        If the rule matches a tuple ``(groups, slash)`` is returned where
+        `groups` is a dict of the raw values and `slash` is `False` if the
+        rule is not a leaf and the path misses its trailing slash. Otherwise
+        the return value is `None`.
+        """
+
+        m = self._regex.search(path)
+        if m is not None:
+            groups = m.groupdict()
+            slash = self.is_leaf or bool(groups.pop('__suffix__'))
+            return groups, slash
+
     def match(self, path):
         """
         Check if the rule matches a given path.
@@ -266,32 +332,229 @@ class Rule:
         otherwise the return value is `None`.
         """
 
-        m = self._regex.search(path)
-        if m is not None:
-            groups = m.groupdict()
+        rv = self.capture(path)
+        if rv is not None:
+            groups, slash = rv
 
-            if not self.is_leaf and not groups.pop('__suffix__'):
+            if not slash:
                 raise HTTPTemporaryRedirect(path + '/')
 
-            result = {}
-            for name, value in groups.items():
-                try:
-                    value = self._converters[name].to_python(value)
-                except ValueError:
-                    return
-                result[str(name)] = value
+            return self.to_python(groups)
 
-            return result
+    def to_python(self, groups):
+        """
+        Convert the raw values captured from a path with the converters of the
+        rule. If a converter refuses a value, the return value is `None`.
+        """
 
+        result = {}
+        for name, value in groups.items():
+            try:
+                value = self._converters[name].to_python(value)
+            except ValueError:
+                return
+            result[str(name)] = value
 
-class Dispatcher(AbstractRouter):
+        return result
+
+
+class RuleNode:
+    """
+    A node of the routing tree.
+
+    Each edge of the tree is a path segment. Static segments are stored in a
+    dictionary while dynamic segments are tried in order of converter weight.
+    A node holds the rules ending with its segment as well as the greedy rules
+    sharing its static prefix.
+    """
 
     def __init__(self):
 
+        self.static = {}
+        self.dynamic = []
+        self.rules = []
+        self.greedy = []
+
+    def insert(self, index, rule):
+        """Register a compiled rule at a given index of the routing table."""
+
+        if rule._segments is None:
+            raise ValueError('rule {!r} is not compiled'.format(rule.url))
+
+        node = self
+        for segment in rule._segments:
+            if isinstance(segment, str):
+                node = node.static.setdefault(segment, RuleNode())
+                continue
+
+            weight, pattern = segment
+            for _, p, _, child in node.dynamic:
+                if p == pattern:
+                    node = child
+                    break
+            else:
+                child = RuleNode()
+                regex = re.compile(pattern, re.UNICODE)
+                node.dynamic.append((weight, pattern, regex, child))
+                node.dynamic.sort(key=lambda edge: edge[0])
+                node = child
+
+        if rule._greedy:
+            node.greedy.append((index, rule))
+        else:
+            node.rules.append((index, rule))
+
+    def lookup(self, path):
+        """
+        Return the list of the rules matching a path, in the form of tuples
+        ``(index, rule, groups, slash)`` where `groups` are the raw values of
+        the variable segments and `slash` is `False` if a non-leaf rule has
+        been matched without its trailing slash.
+        """
+
+        rv = []
+        if path.startswith('/'):
+            self._collect(path, path[1:].split('/'), 0, {}, rv)
+        return rv
+
+    def _collect(self, path, segments, pos, groups, rv):
+
+        for index, rule in self.greedy:
+            captured = rule.capture(path)
+            if captured is not None:
+                rv.append((index, rule) + captured)
+
+        remaining = len(segments) - pos
+
+        if self.rules and remaining == 0:
+            for index, rule in self.rules:
+                if rule.is_leaf:
+                    rv.append((index, rule, groups, True))
+                elif not path.endswith('/'):
+                    rv.append((index, rule, groups, False))
+
+        elif self.rules and remaining == 1 and not segments[pos]:
+            for index, rule in self.rules:
+                if not rule.is_leaf and not path.endswith('//'):
+                    rv.append((index, rule, groups, True))
+
+        if remaining == 0:
+            return
+
+        segment = segments[pos]
+
+        child = self.static.get(segment)
+        if child is not None:
+            child._collect(path, segments, pos + 1, groups, rv)
+
+        for _, _, regex, child in self.dynamic:
+            m = regex.fullmatch(segment)
+            if m is not None:
+                raw = dict(groups)
+                raw.update(m.groupdict())
+                child._collect(path, segments, pos + 1, raw, rv)
+
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+
+
+class ResolutionCache:
+    """
+    A bounded LRU mapping of ``(method, path)`` to the outcome of a resolution.
+    """
+
+    def __init__(self):
+
+        self.hits = self.misses = self.maxsize = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+
+        rv = self._data.get(key)
+        if rv is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return rv
+
+    def put(self, key, value, maxsize):
+
+        self.maxsize = maxsize
+        self._data[key] = value
+        while len(self._data) > maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+
+        self._data.clear()
+
+    def info(self):
+
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+
+class Dispatcher(AbstractRouter):
+    """
+    The dispatcher resolves a request to a rule with one of the following
+    matching modes:
+
+    .. tabularcolumns:: |p{3.5cm}|p{9.5cm}|
+
+    ======================= ===================================================
+    ``'tree'``              the path is resolved segment by segment through a
+                            routing tree (default)
+    ``'regex'``             the regexes of all the rules are combined in a few
+                            alternations, a single search identifies the first
+                            matching rule
+    ``'linear'``            the regex of each rule is tried in order
+    ======================= ===================================================
+
+    In any mode, the rules without variable segments are resolved by a simple
+    lookup on the requested path.
+
+    When a path is matched but none of its rules accepts the method, the
+    dispatcher answers with ``405 Method Not Allowed``. For the ``OPTIONS``
+    method, a ``200 OK`` response with the ``Allow`` header is sent instead.
+
+    The outcome of the other resolutions can be kept in a LRU cache whose size
+    is set by the ``DISPATCHER_CACHE_MAX`` configuration value of the
+    application (``0`` disables the cache). The cache is cleared each time a
+    rule is added.
+
+    The rules derived from the propagation rules of the providers are either
+    generated at once by :meth:`propagate` or on demand, as the requests
+    reach the providers, if the propagation is lazy. In both cases, the
+    derived rules are ranked in the depth-first order of the propagation
+    rules, after the rules of the providers.
+    """
+
+    MODES = ('tree', 'regex', 'linear')
+
+    # the re module of Python 3.4 does not support more than 100 groups
+    # per regex, alternations are split in chunks below this limit.
+    MAX_GROUPS = 99
+
+    def __init__(self, mode='tree'):
+
         super().__init__()
 
+        if mode not in self.MODES:
+            raise ValueError('Unknown dispatcher mode {!r}'.format(mode))
+
+        self.mode = mode
+
         self._rules = []
+        self._ranks = []
         self._providers = {}
+        self._handlers = {}
+        self._tree = RuleNode()
+        self._static = {}
+        self._patterns = {}
+        self._alternations = None
+        self._cache = ResolutionCache()
+        self._app = None
+        self._frontier = []
 
     @asyncio.coroutine
     def resolve(self, request):
@@ -302,24 +565,178 @@ class Dispatcher(AbstractRouter):
         path = request.path
         method = request.method
 
+        # fast path for the rules without any variable segment.
+        static = self._static.get(path)
+        if static is not None:
+            rule, slash = static
+            if not slash:
+                raise HTTPTemporaryRedirect(path + '/')
+            if rule.methods == hdrs.METH_ANY or method in rule.methods:
+                provider = self._providers[rule.endpoint]
+                return MatchInfo({}, rule, provider, self._handler(provider))
+
+        maxsize = request.app.config.get('DISPATCHER_CACHE_MAX', 0)
+
+        if maxsize:
+            key = method, path
+            outcome = self._cache.get(key)
+            if outcome is None:
+                outcome = self._lookup(path, method)
+                self._cache.put(key, outcome, maxsize)
+        else:
+            outcome = self._lookup(path, method)
+
+        rule, match_dict, error = outcome
+
+        if error is not None:
+            raise error()
+
+        provider = self._providers[rule.endpoint]
+        return MatchInfo(match_dict, rule, provider, self._handler(provider))
+
+    def _handler(self, provider):
+
+        # The handlers are built once per provider, to be reused across the
+        # requests (and the middleware chains composed around them).
+
+        handler = self._handlers.get(provider)
+        if handler is None:
+            handler = self._handlers[provider] = _response_handler(provider)
+        return handler
+
+    def _lookup(self, path, method):
+
+        # Unless the path is matched by a rule of a provider, the pending
+        # propagations able to generate a matching rule are expanded until
+        # none of them is left: a derived rule generated later may be ranked
+        # before the one found.
+
+        outcome = self._match(path, method)
+        while not (outcome[0] is not None and outcome[0]._rank[0] == (0,)) \
+                and self._expand_propagations(path):
+            outcome = self._match(path, method)
+        return outcome
+
+    def _match(self, path, method):
+
+        # Returns the outcome of a resolution as a tuple
+        # ``(rule, match_dict, error)`` where `error` is `None` or a callable
+        # building the HTTP exception to raise.
+        #
+        # The rules sharing the same URL match the same paths, each URL
+        # pattern is processed once with its first matching rule and the
+        # methods precomputed by `add_provider`.
+
         allowed_methods = set()
+        patterns = set()
+        found = None
 
-        for rule in self._rules:
-            match_dict = rule.match(path)
+        for index, rule, groups, slash in self._candidates(path):
+
+            # no following rule can be registered before the one found
+            if found is not None and found[0] < index:
+                break
+
+            if rule.url in patterns:
+                continue
+            patterns.add(rule.url)
+
+            if not slash:
+                return None, None, partial(HTTPTemporaryRedirect, path + '/')
+
+            match_dict = rule.to_python(groups)
 
             if match_dict is None:
                 continue
 
-            if rule.methods == hdrs.METH_ANY or method in rule.methods:
-                provider = self._providers[rule.endpoint]
-                return MatchInfo(match_dict, rule, provider)
+            methods, first = self._patterns[rule.url]
+            for hit in first.get(method), first.get(hdrs.METH_ANY):
+                if hit is not None and (found is None or hit[0] < found[0]):
+                    found = hit + (match_dict,)
+
+            allowed_methods |= methods
+
+        if found is not None:
+            return found[1:] + (None,)
 
-            allowed_methods.update(rule.methods)
+        if allowed_methods and method == hdrs.METH_OPTIONS:
+            allow = ','.join(sorted(allowed_methods | {hdrs.METH_OPTIONS}))
+            return None, None, partial(HTTPOk, headers={hdrs.ALLOW: allow})
 
         if allowed_methods:
-            raise HTTPMethodNotAllowed(method, allowed_methods)
+            return None, None, partial(HTTPMethodNotAllowed, method,
+                                       frozenset(allowed_methods))
         else:
-            raise HTTPNotFound()
+            return None, None, HTTPNotFound
+
+    def _candidates(self, path):
+
+        # Returns the rules matching a path in the order of registration, as
+        # tuples ``(index, rule, groups, slash)``.
+
+        if self.mode == 'tree':
+            rv = self._tree.lookup(path)
+            rv.sort(key=lambda c: c[0])
+            return rv
+
+        if self.mode == 'regex':
+            return self._iter_alternations(path)
+
+        return self._iter_rules(path, 0, len(self._rules))
+
+    def _iter_rules(self, path, start, stop):
+
+        for index in range(start, stop):
+            rule = self._rules[index]
+            captured = rule.capture(path)
+            if captured is not None:
+                yield (index, rule) + captured
+
+    def _iter_alternations(self, path):
+
+        if self._alternations is None:
+            self._compile_alternations()
+
+        # each alternation gives the first matching rule of its chunk, the
+        # following rules of the chunk are matched one by one only if the
+        # resolution goes on (method not allowed or value refused by a
+        # converter).
+        for start, stop, regex in self._alternations:
+            m = regex.search(path)
+            if m is not None:
+                first = start + int(m.lastgroup[1:])
+                yield from self._iter_rules(path, first, stop)
+
+    def _compile_alternations(self):
+
+        # The rule regexes are combined into alternations where each branch is
+        # a named group `_N`, N being the position of the rule in the chunk.
+        # The named groups of the rules are made non-capturing, the values are
+        # extracted with the regex of the matching rule.
+
+        named_group = re.compile(r'\(\?P<[^>]+>')
+
+        alternations = []
+        start = groups = 0
+        branches = []
+
+        for index, rule in enumerate(self._rules):
+            pattern = named_group.sub('(?:', rule._regex.pattern)
+            weight = re.compile(pattern, re.UNICODE).groups + 1
+
+            if branches and groups + weight > self.MAX_GROUPS:
+                regex = re.compile('|'.join(branches), re.UNICODE)
+                alternations.append((start, index, regex))
+                start, groups, branches = index, 0, []
+
+            branches.append('(?P<_{}>{})'.format(index - start, pattern))
+            groups += weight
+
+        if branches:
+            regex = re.compile('|'.join(branches), re.UNICODE)
+            alternations.append((start, len(self._rules), regex))
+
+        self._alternations = alternations
 
     def add_provider(self, provider, *urls, endpoint=None, methods=None):
         """
@@ -346,18 +763,115 @@ class Dispatcher(AbstractRouter):
         assert issubclass(provider, Provider), err_msg[0]
         assert endpoint not in self._providers, err_msg[1].format(endpoint)
 
+        rules = []
         for path in urls:
             if not path.startswith('/'):
                 raise ValueError(err_msg[2])
             rule = Rule(path, endpoint, methods)
             rule.compile()
+            rules.append(rule)
+
+        self._register(provider, endpoint, rules)
+
+    def _register(self, provider, endpoint, rules, rank=None):
+
+        # The rules are ranked by a key `(group, index)`. The rules of the
+        # providers are in the group `(0,)`, or `(2,)` once the propagation
+        # is lazy, and are appended. The derived rules are in a group made of
+        # the path of the propagation rules leading to them, they're inserted
+        # at their rank and the routing table has to be indexed again.
 
-            self._rules.append(rule)
+        if rank is None:
+            group = (2,) if self._app is not None else (0,)
+            for rule in rules:
+                rule._rank = group, len(self._rules)
+                self._index_rule(len(self._rules), rule)
+                self._rules.append(rule)
+                self._ranks.append(rule._rank)
 
-        if urls:
+        else:
+            for i, rule in enumerate(rules):
+                rule._rank = rank, i
+                index = bisect_right(self._ranks, rule._rank)
+                self._rules.insert(index, rule)
+                self._ranks.insert(index, rule._rank)
+
+        self._alternations = None
+        self._cache.clear()
+
+        if rules:
             self._providers[endpoint] = provider()
 
-    def propagate(self, app):
+    def _index_rule(self, index, rule):
+
+        # Only the static rules ranked before any derived rule are resolved
+        # by a lookup, otherwise a pending propagation may generate a rule
+        # ranked before them.
+        if not rule.arguments and rule._rank[0] == (0,):
+            self._index_static(rule)
+        self._index_methods(index, rule)
+        self._tree.insert(index, rule)
+
+    def _reindex(self):
+
+        self._tree = RuleNode()
+        self._static = {}
+        self._patterns = {}
+        for index, rule in enumerate(self._rules):
+            self._index_rule(index, rule)
+
+    def _index_static(self, rule):
+
+        # A static rule is reachable by a simple lookup on the requested path,
+        # unless a rule registered before it already matches the same path.
+        # Non-leaf rules are also indexed without their trailing slash to
+        # keep the redirection.
+
+        if rule.is_leaf:
+            keys = [(rule.url, True)]
+        else:
+            url = rule.url.rstrip('/')
+            keys = [(url + '/', True)]
+            if url:
+                keys.append((url, False))
+
+        for key, slash in keys:
+            if not self._tree.lookup(key):
+                self._static[key] = rule, slash
+
+    def _index_methods(self, index, rule):
+
+        # For each URL pattern, keep the union of the allowed methods and the
+        # first rule registered for each method.
+
+        methods, first = self._patterns.setdefault(rule.url, (set(), {}))
+
+        if rule.methods == hdrs.METH_ANY:
+            first.setdefault(hdrs.METH_ANY, (index, rule))
+        else:
+            methods.update(rule.methods)
+            for method in rule.methods:
+                first.setdefault(method, (index, rule))
+
+    def propagate(self, app, lazy=False):
+        """
+        Register the rules derived from the propagation rules of the
+        registered providers.
+
+        If `lazy` is `True`, a propagation rule is only followed when a
+        request path starts with one of the URLs leading to it. The derived
+        rules are then registered and kept for the next requests. Otherwise,
+        the dispatch plans of the endpoints are compiled as well.
+        """
+
+        if lazy:
+            self._app = app
+            for i, (endpoint, provider) in \
+                    enumerate(dict(self._providers).items()):
+                self._push_propagation(provider.__class__, [], (),
+                                       tuple(self.iter_rules(endpoint)), True,
+                                       (1, i))
+            return
 
         for endpoint, provider in dict(self._providers).items():
             for subrule in provider.iter_subrules(app, prefixes=tuple(self.iter_rules(endpoint))):
@@ -365,6 +879,93 @@ class Dispatcher(AbstractRouter):
                 ep, urls, target = subrule
                 self.add_provider(entry, *urls, endpoint=ep, methods=target.methods)
 
+        # compile the dispatch plans of all the endpoints
+        for rule in self._rules:
+            if rule.methods != hdrs.METH_ANY:
+                provider = self._providers[rule.endpoint]
+                for method in rule.methods:
+                    provider.dispatch_plan(rule.endpoint, method)
+
+    def _push_propagation(self, provider, path, levels, prefixes, entry,
+                          rank):
+
+        # A pending propagation is a provider reached by a `path` of
+        # propagation rules. `levels` are the filtered prefixes of the
+        # providers of the path (multiplexed to build the derived URL rules),
+        # `prefixes` the URL rules leading to the provider and `rank` the
+        # position of the provider in the depth-first order of the
+        # propagation rules.
+        #
+        # All the derived rules start with one of the multiplexed prefixes,
+        # a regex matching them is used to select the propagations to expand.
+
+        regexes = []
+        leading = _rule_mpxing(
+            *(levels + (provider._url_filtering(prefixes, None, entry),)))
+
+        for url in leading:
+            if not url:
+                regexes = None
+                break
+            rule = Rule(url)
+            rule.compile()
+            # the regex of a leaf rule ends with `$`
+            regexes.append(re.compile(
+                rule._regex.pattern[:-1] + '(?=/|$)', re.UNICODE))
+
+        self._frontier.append(
+            (provider, path, levels, prefixes, entry, rank, regexes or None))
+
+    def _expand_propagations(self, path):
+
+        # Expand the pending propagations which can lead to the path, returns
+        # `True` if at least one of them has been expanded.
+
+        frontier, self._frontier = self._frontier, []
+        expanded = False
+
+        for node in frontier:
+            regexes = node[-1]
+            if regexes is None or any(r.match(path) for r in regexes):
+                self._expand_propagation(*node[:-1])
+                expanded = True
+            else:
+                self._frontier.append(node)
+
+        if expanded:
+            self._reindex()
+        return expanded
+
+    def _expand_propagation(self, provider, path, levels, prefixes, entry,
+                            rank):
+
+        for position, (endpoint, name, target, urls, _prefixes, _path) in \
+                enumerate(provider.iter_propagations(self._app, path,
+                                                     prefixes, entry)):
+
+            # update the local routing table of each provider of the path
+            chain = [p for p, _ in _path] + [target]
+            for i, (p, n) in enumerate(_path):
+                p._subrules[endpoint] = n, chain[i + 1](), i == 0
+
+            derived = []
+            for url in _rule_mpxing(*(levels + (_prefixes, urls))):
+                rule = Rule(url, endpoint, target.methods)
+                rule.compile()
+                derived.append(rule)
+            self._register(_path[0][0], endpoint, derived, rank + (position,))
+
+            self._push_propagation(target, _path, levels + (_prefixes,), urls,
+                                   False, rank + (position,))
+
+    def cache_info(self):
+        """
+        Return the statistics of the resolution cache as a named tuple
+        ``(hits, misses, maxsize, currsize)``.
+        """
+
+        return self._cache.info()
+
     def get_provider(self, endpoint):
 
         instance = self._providers.get(endpoint, None)
@@ -18,7 +18,17 @@ class LocalStorage:
     @classmethod
     def bind(cls, app):
         cls._app = app
-        cls._task = tasklocals.local(loop=app.loop)
+        cls._task = task = tasklocals.local(loop=app.loop)
+
+        # direct access to the task-local namespace, without going through
+        # the storage
+        def get_request():
+            try:
+                return task.request
+            except AttributeError:
+                raise KeyError('request')
+
+        request._proxy = get_request
 
     def app(self):
         return self._app
@@ -49,19 +59,37 @@ class LocalStorage:
 
         delattr(self._task, name)
 
+    def snapshot(self):
+
+        if self._task is None:
+            raise RuntimeError('LocalStorage is not binded to an application')
+
+        return dict(vars(self._task))
+
+    def update(self, values):
+
+        if self._task is None:
+            raise RuntimeError('LocalStorage is not binded to an application')
+
+        for name, attr in values.items():
+            setattr(self._task, name, attr)
+
+
 class Proxy:
 
+    __slots__ = '_proxy',
+
     def __init__(self, proxy):
         self._proxy = proxy
 
     def __getattr__(self, attr):
-        proxy = self._proxy()
-        return getattr(proxy, attr)
+        return getattr(self._proxy(), attr)
 
     def __repr__(self):
-        proxy = self._proxy()
-        return proxy.__repr__()
+        return self._proxy().__repr__()
 
 
+# until the storage is bound to an application
 request = Proxy(partial(LocalStorage().get, 'request'))
-current_app = Proxy(partial(LocalStorage().app))
+
+current_app = Proxy(LocalStorage().app)
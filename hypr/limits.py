@@ -0,0 +1,107 @@
+"""
+hypr.limits
+-----------
+
+Limits the number of requests processed concurrently. The requests exceeding
+a limit wait in a bounded queue, the ones exceeding the queue are rejected.
+
+:copyright: (c) 2015 by Morgan Delahaye-Prat.
+:license: BSD, see LICENSE for more details.
+"""
+
+
+import asyncio
+
+from collections import deque
+
+
+class Limiter:
+    """
+    Allow `limit` concurrent holders, at most `queue` others wait for a slot
+    (`None` for an unbounded queue).
+
+    Unlike :class:`asyncio.Semaphore`, a limiter isn't bound to an event loop
+    and the waiters are served in order.
+    """
+
+    def __init__(self, limit, queue=0):
+
+        self.limit = limit
+        self.queue = queue
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    @asyncio.coroutine
+    def acquire(self, loop):
+        """
+        Acquire a slot, return `False` if the queue is full.
+        """
+
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+
+        if self.queue is not None and len(self._waiters) >= self.queue:
+            return False
+
+        waiter = asyncio.Future(loop=loop)
+        self._waiters.append(waiter)
+
+        try:
+            yield from waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over before the cancellation
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+        return True
+
+    def release(self):
+        """
+        Release a slot, handed over to the first waiter if any.
+        """
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.active -= 1
+
+
+@asyncio.coroutine
+def acquire_all(limiters, loop):
+    """
+    Acquire a slot of each limiter in turn. Return the acquired limiters, or
+    `None` if one of the queues is full (the slots already acquired are then
+    released).
+    """
+
+    acquired = []
+    try:
+        for limiter in limiters:
+            if not (yield from limiter.acquire(loop)):
+                break
+            acquired.append(limiter)
+        else:
+            return acquired
+    except BaseException:
+        release_all(acquired)
+        raise
+
+    release_all(acquired)
+    return None
+
+
+def release_all(limiters):
+
+    for limiter in reversed(limiters):
+        limiter.release()
@@ -0,0 +1,308 @@
+"""
+hypr.metrics
+------------
+
+Collects the metrics of the requests processed by an application and renders
+them in the Prometheus text format.
+
+The metrics are collected by each process without any lock (the requests are
+processed by a single thread). The workers of a pre-forked server write a
+snapshot of their metrics in a shared directory, regularly and when they stop,
+and the snapshots of every worker are merged when the metrics are rendered.
+The snapshots of the exited workers are folded into the one of the retired
+workers by the parent process.
+
+:copyright: (c) 2015 by Morgan Delahaye-Prat.
+:license: BSD, see LICENSE for more details.
+"""
+
+
+import json
+import os
+
+from bisect import bisect_left
+from collections import defaultdict
+
+
+#: upper bounds of the buckets of the latency histograms, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"') \
+                     .replace('\n', r'\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v))
+                          for k, v in sorted(labels.items())) + '}'
+
+
+def _merge(snapshots):
+
+    # Merge the counters and gauges of several snapshots.
+
+    in_flight = 0
+    requests = defaultdict(int)
+    responses = defaultdict(int)
+    latencies = {}
+    cache = [0, 0]
+
+    for snapshot in snapshots:
+
+        in_flight += snapshot['in_flight']
+        for route, method, count in snapshot['requests']:
+            requests[route, method] += count
+        for status, count in snapshot['responses']:
+            responses[status] += count
+        for route, *latency in snapshot['latencies']:
+            rv = latencies.setdefault(route, [0] * len(latency))
+            for i, value in enumerate(latency):
+                rv[i] += value
+        cache[0] += snapshot['cache'][0]
+        cache[1] += snapshot['cache'][1]
+
+    return {
+        'in_flight': in_flight,
+        'requests': [[r, m, c] for (r, m), c in sorted(requests.items())],
+        'responses': sorted([s, c] for s, c in responses.items()),
+        'latencies': [[r] + l for r, l in sorted(latencies.items())],
+        'cache': cache,
+    }
+
+
+def _pid_alive(pid):
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metrics:
+    """
+    The metrics of an application, enabled by assigning an instance to
+    :attr:`Hypr.metrics`.
+
+    `directory` is where the workers of a pre-forked server write their
+    snapshots, `flush_interval` seconds after the first request accounted
+    since the previous one. When not set, the pre-forked server uses a
+    temporary directory.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0, buckets=BUCKETS):
+
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = tuple(sorted(buckets))
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the metrics of the current process.
+        """
+
+        self.pid = os.getpid()
+        self.in_flight = 0
+        self.requests = defaultdict(int)        # (route, method) -> count
+        self.responses = defaultdict(int)       # status -> count
+        self.latencies = {}                     # route -> [buckets.., sum]
+        self._pending = None
+
+    def start(self, request):
+        """
+        Account a request the application starts processing.
+        """
+
+        self.in_flight += 1
+
+    def finish(self, request, status, duration):
+        """
+        Account a request processed in `duration` seconds, with a response of
+        the HTTP `status`. The `status` is ``None`` if no response was sent
+        (the request was cancelled or its response couldn't be written).
+        """
+
+        self.in_flight -= 1
+
+        match_info = request.match_info
+        route = '' if match_info is None else match_info.route.url
+
+        self.requests[route, request.method] += 1
+        if status is not None:
+            self.responses[status] += 1
+
+        latency = self.latencies.get(route)
+        if latency is None:
+            latency = self.latencies[route] = [0] * (len(self.buckets) + 2)
+        latency[bisect_left(self.buckets, duration)] += 1
+        latency[-1] += duration
+
+        if self.directory is not None and self._pending is None:
+            self._pending = request.app.loop.call_later(
+                self.flush_interval, self._flush_pending, request.app.router)
+
+    def _flush_pending(self, router):
+
+        self._pending = None
+        self.flush(router.cache_info())
+
+    def snapshot(self, cache_info=None):
+        """
+        Return the metrics of the current process as a JSON serializable
+        dict.
+        """
+
+        hits, misses = cache_info[:2] if cache_info is not None else (0, 0)
+
+        return {
+            'pid': self.pid,
+            'in_flight': self.in_flight,
+            'requests': [[r, m, c] for (r, m), c in self.requests.items()],
+            'responses': [[s, c] for s, c in self.responses.items()],
+            'latencies': [[r] + l for r, l in self.latencies.items()],
+            'cache': [hits, misses],
+        }
+
+    def flush(self, cache_info=None):
+        """
+        Write the snapshot of the current process in the shared directory.
+        """
+
+        if self.directory is None:
+            return
+
+        self._write(self.pid, self.snapshot(cache_info))
+
+    def retire(self, pid):
+        """
+        Fold the snapshot of the exited worker `pid` into the snapshot of the
+        retired workers, so that it isn't overwritten by a new process reusing
+        the pid. Called by the parent process when it reaps the worker.
+        """
+
+        if self.directory is None:
+            return
+
+        snapshot = self._read(pid)
+        if snapshot is None:
+            return
+
+        retired = self._read('retired')
+        rv = _merge([snapshot] if retired is None else [retired, snapshot])
+        rv['pid'] = None
+        rv['in_flight'] = 0
+
+        self._write('retired', rv)
+        os.remove(os.path.join(self.directory, '{}.json'.format(pid)))
+
+    def _read(self, name):
+
+        try:
+            path = os.path.join(self.directory, '{}.json'.format(name))
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name, snapshot):
+
+        # the snapshot is replaced atomically, it's read by other processes
+        path = os.path.join(self.directory, '{}.json'.format(name))
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(path + '.tmp', path)
+
+    def _snapshots(self, cache_info):
+
+        yield self.snapshot(cache_info)
+
+        if self.directory is None:
+            return
+
+        for filename in os.listdir(self.directory):
+
+            name, ext = os.path.splitext(filename)
+            if ext != '.json' or name == str(self.pid):
+                continue
+
+            snapshot = self._read(name)
+            if snapshot is None:
+                continue
+
+            # the counters of the exited workers are kept, not their gauges
+            if snapshot['pid'] is not None and \
+                    not _pid_alive(snapshot['pid']):
+                snapshot['in_flight'] = 0
+            yield snapshot
+
+    def collect(self, cache_info=None):
+        """
+        Return the metrics merged across the processes as a dict of the same
+        form than :meth:`snapshot`, without the pid.
+        """
+
+        return _merge(self._snapshots(cache_info))
+
+    def render(self, cache_info=None):
+        """
+        Return the metrics merged across the processes in the Prometheus text
+        format. `cache_info` are the statistics of the resolution cache of the
+        dispatcher.
+        """
+
+        metrics = self.collect(cache_info)
+        lines = []
+
+        def header(name, kind, doc):
+            lines.append('# HELP {} {}'.format(name, doc))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+        header('hypr_requests_total', 'counter',
+               'Number of requests processed, by route and method.')
+        for route, method, count in metrics['requests']:
+            lines.append('hypr_requests_total{} {}'.format(
+                _labels(route=route, method=method), count))
+
+        header('hypr_responses_total', 'counter',
+               'Number of responses sent, by status code.')
+        for status, count in metrics['responses']:
+            lines.append('hypr_responses_total{} {}'.format(
+                _labels(status=status), count))
+
+        header('hypr_request_duration_seconds', 'histogram',
+               'Latency of the requests, by route.')
+        for route, *latency in metrics['latencies']:
+            *counts, total = latency
+            cumulated = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulated += count
+                lines.append('hypr_request_duration_seconds_bucket{} {}'.format(
+                    _labels(route=route, le=bound), cumulated))
+            lines.append('hypr_request_duration_seconds_sum{} {}'.format(
+                _labels(route=route), total))
+            lines.append('hypr_request_duration_seconds_count{} {}'.format(
+                _labels(route=route), cumulated))
+
+        header('hypr_requests_in_flight', 'gauge',
+               'Number of requests being processed.')
+        lines.append('hypr_requests_in_flight {}'.format(metrics['in_flight']))
+
+        hits, misses = metrics['cache']
+        header('hypr_route_cache_hits_total', 'counter',
+               'Number of resolutions served by the route cache.')
+        lines.append('hypr_route_cache_hits_total {}'.format(hits))
+        header('hypr_route_cache_misses_total', 'counter',
+               'Number of resolutions missing the route cache.')
+        lines.append('hypr_route_cache_misses_total {}'.format(misses))
+        header('hypr_route_cache_hit_ratio', 'gauge',
+               'Ratio of the resolutions served by the route cache.')
+        lines.append('hypr_route_cache_hit_ratio {}'.format(
+            hits / (hits + misses) if hits + misses else 0.0))
+
+        return '\n'.join(lines) + '\n'
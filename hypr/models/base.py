@@ -35,15 +35,19 @@ class BaseModel:
         return tuple(getattr(self, k) for k in self._key())
 
     @classmethod
-    def get(cls, _limit=0, _offset=0, _order=None, _search=None, **kwargs):
+    def get(cls, _limit=0, _offset=0, _order=None, _search=None, _where=None,
+            **kwargs):
         """
         Retrieve a list of instance of the class. This method support
         filtering, searching, ordering and pagination (if allowed).
+
+        `_where` is an optional ``dict`` of filters applied in addition to
+        the other filters.
         """
         raise NotImplementedError()
 
     @classmethod
-    def one(cls, *args):
+    def one(cls, *args, _where=None):
         """
         Retrieve a unique instance of the class.
 
@@ -54,7 +58,10 @@ class BaseModel:
         """
 
         if len(args) == len(cls._key()):
-            resp = cls.get(**dict(zip(cls._key(), ((v,) for v in args))))
+            kwargs = dict(zip(cls._key(), ((v,) for v in args)))
+            if _where:
+                kwargs['_where'] = _where
+            resp = cls.get(**kwargs)
             if len(resp) == 1:
                 return resp[0]
             if len(resp) == 0:
@@ -63,18 +70,26 @@ class BaseModel:
         raise NotImplementedError()
 
     @classmethod
-    def count(cls, _search=None, **kwargs):
+    def count(cls, _search=None, _where=None, **kwargs):
         """
         Count the total number of instances of the class.
 
-        :class:`BaseModel` implements a non-optimized version of :meth:`count`
-        based on the :meth:`get` method.
+        The count is first asked to :meth:`__count__`. If it can't answer,
+        :class:`BaseModel` falls back to a non-optimized version of
+        :meth:`count` based on the :meth:`get` method.
         """
 
+        rv = cls.__count__(_search=_search, _where=_where, **kwargs)
+        if rv is not None:
+            return rv
+
         absolute_limit = 100
         if current_app is not None:
             absolute_limit = current_app.config['COLLECTION_ABSOLUTE_MAX']
 
+        if _where:
+            kwargs['_where'] = _where
+
         count = 0
         while True:
             rv = cls.get(_search=_search, _limit=absolute_limit, _offset=count,
@@ -86,6 +101,19 @@ class BaseModel:
 
         return count
 
+    @classmethod
+    def __count__(cls, _search=None, _where=None, **kwargs):
+        """
+        Count the instances matching the filters without retrieving them.
+
+        This method takes the same arguments as :meth:`count` and returns
+        either the count or ``None`` to fall back to paging through
+        :meth:`get`. Backends able to count their instances cheaply should
+        override it. The default method returns ``None``.
+        """
+
+        return None
+
     def save(self, commit=True):
         """
         Mark the instance has to be saved.
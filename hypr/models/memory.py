@@ -20,17 +20,312 @@ from hypr.globals import current_app
 from hypr.exc import ModelConflictException, ModelFilterException, \
     ModelSearchException
 from hypr.models.base import BaseModel
+from bisect import bisect_left, bisect_right, insort
 from collections import defaultdict
+from itertools import islice
 
 
 COMMITTED_OBJ = defaultdict(lambda: dict())
 PENDING_OBJ = defaultdict(lambda: dict())
+INDEXES = {}
+
+_ATOMS = (str, bytes, int, float, complex, bool, type(None))
+
+
+def _immutable(value):
+
+    if isinstance(value, _ATOMS):
+        return True
+    if isinstance(value, (tuple, frozenset)):
+        return all(_immutable(v) for v in value)
+    return False
+
+
+def _sort_key(value):
+
+    # `None` comes first, like NULL values in SQL.
+
+    return value is not None, value
+
+
+def _sort(objs, criteria):
+
+    # Sort a list of instances with a list of `(field, descending)` criteria.
+    # The sort is stable, the equal instances keep the order of the store.
+
+    for field, desc in reversed(criteria):
+        objs.sort(key=lambda obj: _sort_key(getattr(obj, field, None)),
+                  reverse=desc)
+    return objs
+
+
+def _ngrams(value, n=3):
+
+    # The substrings of a value up to `n` characters.
+
+    return {value[i:i+k] for k in range(1, n + 1)
+                         for i in range(len(value) - k + 1)}
+
+
+def _tuple(value):
+
+    if value is None:
+        return ()
+    if not isinstance(value, tuple):
+        return value,
+    return value
+
+
+def _criteria(order):
+
+    if not isinstance(order, tuple):
+        order = order,
+    return [(c[1:], True) if c.startswith('!') else (c, False) for c in order]
+
+
+class _Indexes:
+
+    # The hash indexes of the committed instances of a model, mapping the
+    # values of each indexed property to the uids of the instances. The
+    # instances with an unhashable value or without the property aren't
+    # indexed and always are candidates (filtering the latter raises, like
+    # without the index). The rank of each uid keeps track of the order of
+    # the store.
+    #
+    # The orderable properties are indexed in sorted lists of entries
+    # `(not None, value, rank, uid)`. The entries added by a commit are
+    # inserted with bisect, or appended then sorted when they're numerous.
+    # An ordered index is dropped if its values can't be compared.
+    #
+    # The searchable properties are indexed in inverted indexes mapping the
+    # n-grams (up to `NGRAM` characters) of their text to the uids.
+
+    BULK = 64
+    NGRAM = 3
+
+    def __init__(self, spec, store):
+
+        self.spec = spec
+        self.fields, orderable, searchable = spec
+        self.hashes = {f: defaultdict(set) for f in self.fields}
+        self.unindexed = {f: set() for f in self.fields}
+        self.sorted = {f: [] for f in orderable}
+        self.grams = {f: defaultdict(set) for f in searchable}
+        self.rank = {}
+        self._next = 0
+        self._added = []
+
+        for uid, obj in store.items():
+            self.add(uid, obj)
+        self.flush()
+
+    def add(self, uid, obj):
+
+        if uid not in self.rank:
+            self.rank[uid] = self._next
+            self._next += 1
+
+        for field in self.fields:
+            try:
+                self.hashes[field][getattr(obj, field)].add(uid)
+            except (AttributeError, TypeError):
+                self.unindexed[field].add(uid)
+
+        for field, index in self.grams.items():
+            value = getattr(obj, field, None)
+            if value is not None:
+                for gram in _ngrams(str(value), self.NGRAM):
+                    index[gram].add(uid)
+
+        if self.sorted:
+            self._added.append((uid, obj))
+
+    def _entry(self, field, uid, obj):
+        return _sort_key(getattr(obj, field, None)) + (self.rank[uid], uid)
+
+    def flush(self):
+
+        # Insert the entries added since the last flush in the ordered
+        # indexes.
+
+        added, self._added = self._added, []
+
+        for field, entries in list(self.sorted.items()):
+            new = [self._entry(field, uid, obj) for uid, obj in added]
+            try:
+                if len(new) > self.BULK:
+                    entries.extend(new)
+                    entries.sort()
+                else:
+                    for entry in new:
+                        insort(entries, entry)
+            except TypeError:
+                del self.sorted[field]
+
+    def remove(self, uid, obj, replaced=False):
+
+        for field, entries in list(self.sorted.items()):
+            entry = self._entry(field, uid, obj)
+            try:
+                i = bisect_left(entries, entry)
+            except TypeError:
+                del self.sorted[field]
+                continue
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+
+        for field, index in self.grams.items():
+            value = getattr(obj, field, None)
+            if value is not None:
+                for gram in _ngrams(str(value), self.NGRAM):
+                    bucket = index.get(gram)
+                    if bucket is not None:
+                        bucket.discard(uid)
+                        if not bucket:
+                            del index[gram]
+
+        for field in self.fields:
+            try:
+                value = getattr(obj, field)
+                bucket = self.hashes[field].get(value)
+            except (AttributeError, TypeError):
+                self.unindexed[field].discard(uid)
+                continue
+            if bucket is not None:
+                bucket.discard(uid)
+                if not bucket:
+                    del self.hashes[field][value]
+
+        if not replaced:
+            del self.rank[uid]
+
+    def lookup(self, field, values):
+
+        # The uids of the instances whose property may be one of the values,
+        # `None` if the index can't be used.
+
+        index = self.hashes.get(field)
+        if index is None:
+            return None
+
+        rv = set(self.unindexed[field])
+        for value in values:
+            try:
+                rv.update(index.get(value, ()))
+            except TypeError:
+                return None
+        return rv
+
+    def candidates(self, filters):
+
+        # Intersect the uids matching the indexed filters, smallest first.
+        # Returns them in the order of the store or `None` if none of the
+        # filters is indexed.
+
+        sets = []
+        for field, values in filters:
+            if not isinstance(values, tuple):
+                values = values,
+            uids = self.lookup(field, values or (None,))
+            if uids is not None:
+                sets.append(uids)
+
+        if not sets:
+            return None
+
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def exact(self, filters):
+
+        # Whether the candidates of the filters are exactly the matching
+        # instances: all the filters are indexed and all the values hashable.
+
+        for field, values in filters:
+            if field not in self.hashes or self.unindexed[field]:
+                return False
+            if not isinstance(values, tuple):
+                values = values,
+            try:
+                for value in values:
+                    hash(value)
+            except TypeError:
+                return False
+        return True
+
+    def search(self, fields, terms):
+
+        # The uids of the instances whose text may contain one of the terms
+        # in one of the fields: the ones with all the n-grams of a term (or
+        # the term itself if it's short enough).
+
+        rv = set()
+        for field in fields:
+            index = self.grams[field]
+            for term in terms:
+                if len(term) <= self.NGRAM:
+                    rv.update(index.get(term, ()))
+                    continue
+                sets = sorted((index.get(term[i:i+self.NGRAM], set())
+                               for i in range(len(term) - self.NGRAM + 1)),
+                              key=len)
+                rv.update(sets[0].intersection(*sets[1:]))
+        return rv
+
+    def walk(self, field, desc, skip=0):
+
+        # Iterate over the ordered index of a property, by groups of uids
+        # with the same value. The uids of a group are in the order of the
+        # store. To skip the first `skip` uids, the walk starts from the
+        # group of the first uid kept (found by bisection) and the number of
+        # uids left to skip is yielded with each group (0 after the first).
+
+        entries = self.sorted[field]
+        size = len(entries)
+        if skip >= size:
+            return
+
+        if desc:
+            present, value = entries[size - 1 - skip][:2]
+            end = bisect_right(entries, (present, value, float('inf')))
+            positions, skip = range(end - 1, -1, -1), skip - (size - end)
+        else:
+            present, value = entries[skip][:2]
+            start = bisect_left(entries, (present, value))
+            positions, skip = range(start, size), skip - start
+
+        group, current = [], None
+        for i in positions:
+            present, value, _, uid = entries[i]
+            if group and (present, value) != current:
+                yield (group[::-1] if desc else group), skip
+                group, skip = [], 0
+            current = present, value
+            group.append(uid)
+
+        if group:
+            yield (group[::-1] if desc else group), skip
 
 
 class MemoryModel(BaseModel):
     """
+    The committed instances are stored as snapshots, copied when committed.
+    The instances returned to the caller are copies of the snapshots, shallow
+    ones if the properties of the snapshot are all immutable.
+
+    The properties listed in ``__indexes__`` (``__filters__`` by default) are
+    indexed to resolve the filters without scanning all the instances. The
+    ones listed in ``__orderable__`` are kept sorted to return the pages
+    ordered by `_order` without sorting all the instances.
+
+    The `_search` terms are looked for in the text of the properties listed
+    in ``__search__``, an instance matches if one of them contains one of the
+    terms (like with ``LIKE '%term%'`` in SQL, case-sensitive). The text is
+    indexed by n-grams.
     """
 
+    _frozen = False
+
     def __init__(self, **kwargs):
 
         self._version = 0
@@ -71,7 +366,8 @@ class MemoryModel(BaseModel):
         return True
 
     @classmethod
-    def get(cls, _limit=0, _offset=0, _order=None, _search=None, **kwargs):
+    def get(cls, _limit=0, _offset=0, _order=None, _search=None, _where=None,
+            **kwargs):
 
         # get the default and absolute limits of the application
         default_limit = 100
@@ -80,15 +376,146 @@ class MemoryModel(BaseModel):
             default_limit = current_app.config['COLLECTION_DEFAULT_MAX']
             absolute_limit = current_app.config['COLLECTION_ABSOLUTE_MAX']
 
-        if _search:
+        store, indexes, uids, match = cls._select(_search, _where, kwargs)
+        criteria = _criteria(_order) if _order else []
+
+        # without any filter, the offset is skipped within the ordered index
+        offset = _offset
+
+        if criteria and criteria[0][0] in indexes.sorted and \
+                (uids is None or len(uids) * 4 > len(store)):
+            skip = 0
+            if match is None:
+                skip, offset = _offset, 0
+            matches = cls._walk(store, indexes, uids, criteria, match, skip)
+        else:
+            if uids is not None:
+                uids = sorted(uids, key=indexes.rank.__getitem__)
+            objs = store.values() if uids is None else (store[k] for k in uids)
+            matches = objs if match is None else filter(match, objs)
+            if criteria:
+                matches = _sort(list(matches), criteria)
+
+        limit = min(_limit or default_limit, absolute_limit)
+        return [v._checkout() for v in islice(matches, offset, offset+limit)]
+
+    @classmethod
+    def _select(cls, _search, _where, kwargs):
+
+        # The committed instances, their indexes, the uids of the candidates
+        # (`None` for all the instances) and the predicate of the matching
+        # ones (`None` without any filter).
+
+        searchable = _tuple(getattr(cls, '__search__', None))
+        terms = tuple(str(t) for t in _tuple(_search or None))
+        if terms and not searchable:
             raise ModelSearchException()
 
         store = COMMITTED_OBJ[cls.__name__]
-        resp = {k: copy.deepcopy(v) for k, v in store.items()
-                                             if v._match(**kwargs)}
+        _where = _where or {}
 
-        limit = min(_limit or default_limit, absolute_limit)
-        return list(resp.values())[_offset:_offset+limit]
+        filters = getattr(cls, '__filters__', None)
+        for k in list(kwargs) + list(_where):
+            if not (filters is None or k in filters):
+                raise ModelFilterException('Unknown filter `{}`'.format(k))
+
+        indexes = cls._indexes()
+        uids = indexes.candidates(list(kwargs.items()) + list(_where.items()))
+
+        match = None
+        if kwargs or _where:
+            match = lambda v: v._match(**kwargs) and v._match(**_where)
+
+        if terms:
+            if all(terms):
+                found = indexes.search(searchable, terms)
+                uids = found if uids is None else uids & found
+            match = lambda v, match=match: \
+                v._contains(searchable, terms) and (match is None or match(v))
+
+        return store, indexes, uids, match
+
+    @classmethod
+    def __count__(cls, _search=None, _where=None, **kwargs):
+
+        # The matching instances are counted without being copied, from the
+        # store or the indexes when they're exact.
+
+        store, indexes, uids, match = cls._select(_search, _where, kwargs)
+        if match is None:
+            return len(store)
+        filters = list(kwargs.items()) + list((_where or {}).items())
+        if not _search and uids is not None and indexes.exact(filters):
+            return len(uids)
+        objs = store.values() if uids is None else (store[k] for k in uids)
+        return sum(1 for v in objs if match(v))
+
+    def _contains(self, fields, terms):
+
+        for field in fields:
+            value = getattr(self, field, None)
+            if value is not None:
+                value = str(value)
+                if any(term in value for term in terms):
+                    return True
+        return False
+
+    @staticmethod
+    def _walk(store, indexes, uids, criteria, match, skip=0):
+
+        # The matching instances in the order of the ordered index of the
+        # first criterion, the ties are sorted with the other criteria.
+
+        field, desc = criteria[0]
+        for group, skip in indexes.walk(field, desc, skip):
+            objs = [store[k] for k in group if uids is None or k in uids]
+            if match is not None:
+                objs = [v for v in objs if match(v)]
+            if len(objs) > 1 and len(criteria) > 1:
+                _sort(objs, criteria[1:])
+            yield from objs[skip:]
+
+    @classmethod
+    def _index_spec(cls):
+
+        def fields(attr, default=None):
+            rv = getattr(cls, attr, default)
+            if rv is None:
+                return ()
+            if isinstance(rv, str):
+                return rv,
+            return tuple(rv)
+
+        return (fields('__indexes__', getattr(cls, '__filters__', None)),
+                fields('__orderable__'), fields('__search__'))
+
+    @classmethod
+    def _indexes(cls):
+
+        # The indexes are built on first use, and built again when the
+        # indexed properties are changed.
+
+        spec = cls._index_spec()
+        rv = INDEXES.get(cls.__name__)
+        if rv is None or rv.spec != spec:
+            rv = INDEXES[cls.__name__] = _Indexes(spec,
+                                                  COMMITTED_OBJ[cls.__name__])
+        return rv
+
+    def _snapshot(self):
+
+        # The copy of the instance kept by the store.
+
+        frozen = all(_immutable(v) for v in vars(self).values())
+        rv = copy.copy(self) if frozen else copy.deepcopy(self)
+        object.__setattr__(rv, '_frozen', frozen)
+        return rv
+
+    def _checkout(self):
+
+        # A copy of a snapshot given to the caller.
+
+        return copy.copy(self) if self._frozen else copy.deepcopy(self)
 
     def save(self, commit=True):
 
@@ -136,11 +563,25 @@ class MemoryModel(BaseModel):
             if v._modified:
                 v._version += 1
 
-        # delete marked objects
-        to_delete = (k for k, v in pending.items() if v._delete)
-        store.update(pending)
-        for obj in to_delete:
-            del store[obj]
+        indexes = INDEXES.get(cls.__name__)
+        if indexes is not None and indexes.spec != cls._index_spec():
+            # built again on the next use
+            del INDEXES[cls.__name__]
+            indexes = None
+
+        for k, v in pending.items():
+
+            old = store.pop(k, None) if v._delete else store.get(k)
+            if indexes is not None and old is not None:
+                indexes.remove(k, old, replaced=not v._delete)
+
+            if not v._delete:
+                store[k] = v._snapshot()
+                if indexes is not None:
+                    indexes.add(k, store[k])
+
+        if indexes is not None:
+            indexes.flush()
         PENDING_OBJ.pop(cls.__name__, None)
 
     @classmethod
@@ -156,4 +597,5 @@ class MemoryModel(BaseModel):
 
         COMMITTED_OBJ.pop(cls.__name__, None)
         PENDING_OBJ.pop(cls.__name__, None)
+        INDEXES.pop(cls.__name__, None)
 
@@ -94,7 +94,7 @@ class SqlAlchemyModel(BaseSQLA, BaseModel):
         return sqlalchemy.or_(*rv)
 
     @classmethod
-    def _query_builder(cls, _search, _session, **kwargs):
+    def _query_builder(cls, _search, _session, _where=None, **kwargs):
         """
         A helper to build the SQL query from various parameters.
         """
@@ -104,6 +104,9 @@ class SqlAlchemyModel(BaseSQLA, BaseModel):
         if kwargs:
             query = query.filter(cls._filter(**kwargs))
 
+        if _where:
+            query = query.filter(cls._filter(**_where))
+
         if _search:
             query = query.filter(cls._search(_search))
 
@@ -146,8 +149,8 @@ class SqlAlchemyModel(BaseSQLA, BaseModel):
         return rv
 
     @classmethod
-    def get(cls, _limit=0, _offset=0, _order=None, _search=None, _session=None,
-            **kwargs):
+    def get(cls, _limit=0, _offset=0, _order=None, _search=None, _where=None,
+            _session=None, **kwargs):
 
         if _session is None:
             _session = cls.session(True)
@@ -159,7 +162,7 @@ class SqlAlchemyModel(BaseSQLA, BaseModel):
             default_limit = current_app.config['COLLECTION_DEFAULT_MAX']
             absolute_limit = current_app.config['COLLECTION_ABSOLUTE_MAX']
 
-        query = cls._query_builder(_search, _session, **kwargs)
+        query = cls._query_builder(_search, _session, _where, **kwargs)
 
         if _order:
             if not isinstance(_order, tuple):
@@ -175,7 +178,7 @@ class SqlAlchemyModel(BaseSQLA, BaseModel):
         return query.slice(_offset, _offset+limit).all()
 
     @classmethod
-    def one(cls, *args, _session=None):
+    def one(cls, *args, _where=None, _session=None):
 
         col = cls._key()
         if _session is None:
@@ -186,21 +189,24 @@ class SqlAlchemyModel(BaseSQLA, BaseModel):
         if len(col) != len(args):
             raise ValueError('Invalid key')
 
+        if _where:
+            query = query.filter(cls._filter(**_where))
+
         # single primary key and no user-defined __key__
-        if getattr(cls, '__key__', None) is None and len(col) == 1:
+        elif getattr(cls, '__key__', None) is None and len(col) == 1:
             return query.get(args[0])
 
         # make a zip of the col and _key lists
         return query.filter_by(**dict(zip(col, args))).first()
 
     @classmethod
-    def count(cls, _search=None, _session=None, **kwargs):
+    def count(cls, _search=None, _where=None, _session=None, **kwargs):
         """
         """
         if _session is None:
             _session = cls.session(True)
 
-        return cls._query_builder(_search, _session, **kwargs).count()
+        return cls._query_builder(_search, _session, _where, **kwargs).count()
 
     def save(self, commit=True, _session=None):
 
@@ -12,12 +12,16 @@ behavior.
 
 import asyncio
 import inspect
+import time
 import uuid
 
 from hypr.helpers import _rule_mangling, _rule_mpxing
-from hypr.globals import request
+from hypr.globals import LocalStorage, request
+from hypr.limits import Limiter, acquire_all, release_all
+from hypr.web_exceptions import HTTPClientError, HTTPMethodNotAllowed, \
+    HTTPServiceUnavailable
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 HTTP_METHODS = frozenset(['get', 'post', 'head', 'options', 'delete', 'put',
                           'trace', 'patch'])
@@ -35,7 +39,145 @@ def _endpoint_uuid(path):
     return str(uuid.uuid5(uuid.NAMESPACE_URL, url))
 
 
-def checkpoint(scope=None, priority=10, methods=None):
+def _call_spec(cls, name):
+    # Introspect a method once to be able to call it with the dynamic segments
+    # of the URL. Returns a tuple ``(coroutine, bound, params, memoize, cache,
+    # entry_map, path_map)`` where `bound` tells if the provider instance has
+    # to be passed to the coroutine, `params` are the accepted arguments
+    # (`None` if any keyword argument is accepted), `memoize` tells if the
+    # result is kept for the rest of the request, `cache` is the
+    # :class:`CheckpointCache` of a checkpoint and the two last items are
+    # dicts used to memoize the argument associated to each segment name for
+    # an entry provider or not.
+
+    func = getattr(cls, name)
+    bound = inspect.isfunction(func) and \
+        not isinstance(inspect.getattr_static(cls, name), staticmethod)
+    memoize = getattr(func, '__hypr_memo', False)
+    cache = getattr(func, '__hypr_cp_cache', None)
+
+    req, _, kw, _ = inspect.getargspec(func)
+
+    # ensure func is a generator
+    if (not asyncio.iscoroutinefunction(func) and
+            not inspect.isgeneratorfunction(func)):
+        func = asyncio.coroutine(func)
+
+    params = None if kw is not None else frozenset(req)
+    return func, bound, params, memoize, cache, {}, {}
+
+
+def _is_mangled(key):
+    return '__' in key and key[0] == '_' and key[1] != '_'
+
+
+class CheckpointCache:
+    """
+    A bounded cache of the outcome of security checkpoints shared across the
+    requests.
+
+    The outcome is cached for the key returned by ``key(request, **kwargs)``
+    where `kwargs` are the keyword arguments the checkpoint is called with,
+    that is the variable segments of the URL filtered down to the ones in its
+    signature. A key of `None` disables the cache for the request.
+
+    Only the outcome is cached: on a hit the checkpoint isn't executed at all
+    and its side effects (task-local values, ``request.m_memo``, ...) don't
+    happen. Only a checkpoint without side effects may be cached.
+
+    A checkpoint passing is cached for `ttl` seconds. A checkpoint rejecting
+    the request with a client error (4xx) is cached for `negative_ttl`
+    seconds (default: `ttl`, ``0`` disables the negative caching). The
+    least recently used outcomes are discarded beyond `maxsize` entries.
+
+    Usage::
+
+        auth_cache = CheckpointCache(
+            lambda request, **kw: request.headers.get('AUTHORIZATION'),
+            ttl=300)
+
+        class MyProvider(Provider):
+
+            @checkpoint(cache=auth_cache)
+            def check_token(self):
+                ...
+
+        # when a token is revoked
+        auth_cache.invalidate(token)
+    """
+
+    def __init__(self, key, ttl=60, negative_ttl=None, maxsize=1024):
+
+        self.key = key
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def invalidate(self, key=None):
+        """
+        Discard the outcomes cached for a key, or all of them if no key is
+        supplied.
+        """
+
+        if key is None:
+            self._data.clear()
+            return
+
+        for k in [k for k in self._data if k[-1] == key]:
+            del self._data[k]
+
+    def _put(self, key, expires, failure):
+
+        self._data[key] = expires, failure
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    @asyncio.coroutine
+    def apply(self, key, func, *args, **kwargs):
+
+        # Return or raise the cached outcome for `key`, otherwise run the
+        # checkpoint and cache its outcome.
+
+        now = time.monotonic()
+        entry = self._data.get(key)
+
+        if entry is not None:
+            expires, failure = entry
+            if expires > now:
+                self.hits += 1
+                self._data.move_to_end(key)
+                if failure is None:
+                    return None
+                exc, headers, reason, body = failure
+                raise exc(headers=headers, reason=reason, body=body)
+            del self._data[key]
+
+        self.misses += 1
+
+        try:
+            rv = yield from func(*args, **kwargs)
+        except HTTPClientError as exc:
+            # HTTPMethodNotAllowed can't be raised again without its arguments
+            if self.negative_ttl > 0 and \
+                    not isinstance(exc, HTTPMethodNotAllowed):
+                self._put(key, now + self.negative_ttl,
+                          (type(exc), exc.headers.copy(), exc.reason,
+                           exc.body))
+            raise
+
+        if self.ttl > 0:
+            self._put(key, now + self.ttl, None)
+        return rv
+
+
+def checkpoint(scope=None, priority=10, methods=None, concurrent=False,
+               memoize=False, cache=None):
     """
     ``checkpoint`` can decorate a method of a provider to make it a security
     checkpoint.
@@ -78,6 +220,25 @@ def checkpoint(scope=None, priority=10, methods=None):
                     one method need to be specified.
                     (default: ``None``)
 
+    :param concurrent: Mark the checkpoint as independent from the others. The
+                       concurrent checkpoints of a provider sharing the same
+                       priority are executed together, the first one to fail
+                       cancels the others. Each checkpoint runs in its own
+                       task with a copy of the task-local values, the values
+                       it sets are kept for the rest of the request once the
+                       whole group succeeded (the first checkpoint of the
+                       group, by name, wins when several set the same name). Rebinding
+                       an existing value isn't propagated.
+                       (default: ``False``)
+
+    :param memoize: Keep the result of the checkpoint for the rest of the
+                    request. The checkpoint is executed once for each set of
+                    arguments, even if it is reached several times along the
+                    processing chain. (default: ``False``)
+
+    :param cache: A :class:`CheckpointCache` keeping the outcome of the
+                  checkpoint across the requests. (default: ``None``)
+
     Usages::
 
         class MyProvider(Provider):
@@ -103,6 +264,14 @@ def checkpoint(scope=None, priority=10, methods=None):
             def check_high_priority_get(self):
                 ...
 
+            @checkpoint(priority=5, concurrent=True)
+            def check_token(self):
+                ...
+
+            @checkpoint(priority=5, concurrent=True)
+            def check_quota(self):
+                ...
+
     """
 
     if methods is not None and not isinstance(methods, tuple):
@@ -110,7 +279,7 @@ def checkpoint(scope=None, priority=10, methods=None):
 
     if hasattr(scope, '__call__'):
 
-        setattr(scope, '__hypr_cp', ((None,), priority, methods))
+        setattr(scope, '__hypr_cp', ((None,), priority, methods, concurrent))
         return scope
 
     else:
@@ -119,13 +288,17 @@ def checkpoint(scope=None, priority=10, methods=None):
             scope = scope,
 
         def decorator(fn):
-            setattr(fn, '__hypr_cp', (scope, priority, methods))
+            setattr(fn, '__hypr_cp', (scope, priority, methods, concurrent))
+            if memoize:
+                setattr(fn, '__hypr_memo', memoize)
+            if cache is not None:
+                setattr(fn, '__hypr_cp_cache', cache)
             return fn
 
         return decorator
 
 
-def filter(key=None, scope=None, requires=None):
+def filter(key=None, scope=None, requires=None, memoize=False):
     """
     ``filter`` is a decorator method to enable a :class:`Provider`'s method
     as a mandatory filter.
@@ -185,6 +358,9 @@ def filter(key=None, scope=None, requires=None):
         :class:`tuple`          a tuple of ``str`` to specify multiple variable
                                 part name at once
         ======================= ===============================================
+
+    :param memoize: keep the returned value of the filter for the rest of the
+                    request. (default: ``False``)
     """
 
     if not isinstance(scope, tuple):
@@ -199,6 +375,8 @@ def filter(key=None, scope=None, requires=None):
     else:
         def decorator(fn):
             setattr(fn, '__hypr_fltr', (scope, requires, key))
+            if memoize:
+                setattr(fn, '__hypr_memo', memoize)
             return fn
 
         return decorator
@@ -217,35 +395,44 @@ class ProviderType(type):
         sec_scope = defaultdict(set)
 
         fltrs = {}
+        calls = {}
 
         parents = inspect.getmembers(cls, inspect.isfunction)
         for name, func in parents:
 
             if name in HTTP_METHODS:
                 methods.add(name.upper())
+                calls[name] = _call_spec(cls, name)
 
             # search filter methods
             hypr_fltr = getattr(func, '__hypr_fltr', None)
             if hypr_fltr is not None:
+                calls[name] = _call_spec(cls, name)
                 for scope in hypr_fltr[0]:
                     if scope not in fltrs:
                         fltrs[scope] = set()
                     fltrs[scope].add((name,) + hypr_fltr[1:])
 
             # search security checkpoint methods
-            scopes, priority, verbs = getattr(func, '__hypr_cp', ((), 0, None))
+            scopes, priority, verbs, concurrent = getattr(
+                func, '__hypr_cp', ((), 0, None, False))
             for scope in scopes:
-                sec_scope[scope].add((priority, name, verbs))
+                calls[name] = _call_spec(cls, name)
+                sec_scope[scope].add((priority, name, verbs, concurrent))
 
+        # the concurrent checkpoints are grouped by priority and executed
+        # before the sequential ones of the same priority
         for k, v in sec_scope.items():
             tmp = list(v)
-            tmp.sort()
-            sec_scope[k] = tuple((f, v) for _, f, v in tmp)
+            tmp.sort(key=lambda t: (t[0], not t[3], t[1]))
+            sec_scope[k] = tuple((f, v, p if c else None) for p, f, v, c in tmp)
 
         cls.methods = tuple(methods)
         cls._sec_scope = dict(sec_scope)
         cls._fltrs = fltrs
+        cls._calls = calls
         cls._subrules = {}
+        cls._limiter = None
         return cls
 
 
@@ -292,7 +479,14 @@ class Provider(metaclass=ProviderType):
 
     name = None
     methods = None
-    _sec_scope = _fltrs = _subrules = None
+    _sec_scope = _fltrs = _calls = _subrules = None
+    _plans = _limiter = None
+
+    #: maximum number of requests processed concurrently by the provider
+    #: (`None` for no limit) and maximum number of requests waiting for a
+    #: slot (`None` for an unbounded queue), see :meth:`limiter`.
+    max_concurrency = None
+    max_queue = 0
 
     propagation_rules = {}
 
@@ -339,14 +533,47 @@ class Provider(metaclass=ProviderType):
                     be generated.
         """
 
-        err_msg = ['No valid endpoint {!r} has been found.',
-                   'No URLs available to reach {!r}']
-
         entry = False
         if path is None:
             entry = True
             path = []
 
+        for endpoint, name, target, urls, _prefixes, _path in \
+                cls.iter_propagations(app, path, prefixes, entry):
+
+            cls._subrules[endpoint] = name, target(), entry
+            yield endpoint, _rule_mpxing(_prefixes, urls), target
+
+            for endpoint, urls, final in target.iter_subrules(app, _path, urls):
+                cls._subrules[endpoint] = name, target(), entry
+                yield endpoint, _rule_mpxing(_prefixes, urls), final
+
+    @classmethod
+    def iter_propagations(cls, app, path, prefixes, entry):
+        """
+        Return an iterable of the propagation rules of the Provider which can
+        be followed without creating a cycle. Unlike :meth:`iter_subrules`,
+        the propagation rules of the targets are not followed.
+
+        The format of each item is as follow::
+
+            (endpoint, name, target, urls, prefixes, path)
+
+        where `urls` are the mangled URL rules of the target, `prefixes` the
+        URL rules leading to the Provider once filtered and `path` the list of
+        ``(provider, name)`` followed to reach the target.
+
+        :param app: An instance of the application in which the subrules are to
+                    be generated.
+        :param path: The list of ``(provider, name)`` followed to reach the
+                     Provider.
+        :param prefixes: The URL rules leading to the Provider.
+        :param entry: `True` if the Provider is the entry point of the path.
+        """
+
+        err_msg = ['No valid endpoint {!r} has been found.',
+                   'No URLs available to reach {!r}']
+
         for name, rule in cls.propagation_rules.items():
 
             _prefixes = cls._url_filtering(prefixes, None, entry)
@@ -380,12 +607,7 @@ class Provider(metaclass=ProviderType):
 
                 assert urls, err_msg[1].format(target.name)
 
-                cls._subrules[endpoint] = name, target(), entry
-                yield endpoint, _rule_mpxing(_prefixes, urls), target
-
-                for endpoint, urls, final in target.iter_subrules(app, _path, urls):
-                    cls._subrules[endpoint] = name, target(), entry
-                    yield endpoint, _rule_mpxing(_prefixes, urls), final
+                yield endpoint, name, target, urls, _prefixes, _path
 
     # TODO: implement the autobinding
     #@classmethod
@@ -401,79 +623,253 @@ class Provider(metaclass=ProviderType):
         return (ep == self.name) or self._subrules.get(ep, (0, 0, False))[2]
 
     @asyncio.coroutine
-    def _call_meth(self, name):
-
-        args = request.match_info
+    def _call_meth(self, name, entry=None):
 
         # Retrieve a method by its name and call it with a set of keyword
         # arguments defined from the method signature and a set of key-values.
+        # The signature of the method is introspected once by class.
+
+        spec = self._calls.get(name)
+        if spec is None:
+            spec = self._calls[name] = _call_spec(type(self), name)
+
+        meth, bound, params, memoize, cache, entry_map, path_map = spec
+
+        if entry is None:
+            entry = self.is_entry
+
+        # Filter out unwanted values from dynamic segments of the URL, the
+        # argument associated to each segment is memoized.
+        keymap = entry_map if entry else path_map
+        kwargs = {}
+
+        for key, value in request.match_info.items():
+
+            try:
+                arg = keymap[key]
+            except KeyError:
+                if entry:
+                    arg = None if _is_mangled(key) else key
+                else:
+                    unmangle = '_{}__'.format(self.name)
+                    arg = key[len(unmangle):] if key.startswith(unmangle) \
+                        else None
+                if params is not None and arg not in params:
+                    arg = None
+                keymap[key] = arg
+
+            if arg is not None:
+                kwargs[arg] = value
+
+        # The memoized results are stored on the request, keyed by the
+        # provider, the method and its arguments.
+        if memoize:
+            memo = (type(self), name, tuple(sorted(kwargs.items())))
+            try:
+                return request.m_memo[memo]
+            except KeyError:
+                pass
+
+        key = None if cache is None else cache.key(request, **kwargs)
+        args = (self,) if bound else ()
+
+        if key is not None:
+            rv = yield from cache.apply((type(self), name, key), meth, *args,
+                                        **kwargs)
+        else:
+            rv = yield from meth(*args, **kwargs)
 
-        meth = getattr(self, name)
-        req, _, kw, _ = inspect.getargspec(meth)
+        if memoize:
+            request.m_memo[memo] = rv
+        return rv
 
-        # Filter out unwanted values from dynamic segments of the URL
-        is_mangled = lambda key: '__' in key and key[0] == '_' and key[1] != '_'
-        if self.is_entry:
-            args = {k: v for k, v in args.items() if not is_mangled(k)}
-        else:
-            unmangle = '_{}__'.format(self.name)
-            args = {k[len(unmangle):]: v for k, v in args.items()
-                    if k.startswith(unmangle)}
+    @asyncio.coroutine
+    def _call_group(self, names, entry=None):
 
-        # ensure meth is a generator
-        if (not asyncio.iscoroutinefunction(meth) and
-                not inspect.isgeneratorfunction(meth)):
-            meth = asyncio.coroutine(meth)
+        # Run a group of concurrent checkpoints, each one in its own task. The
+        # task-local namespace is copied into every task and the values set by
+        # the checkpoints are merged back once the group succeeded. The first
+        # exception raised cancels the pending siblings.
 
-        if kw is None:
-            rv = yield from meth(**{k: v for k, v in args.items() if k in req})
-        else:
-            rv = yield from meth(**args) # any kerword arguments is accepted
+        storage = LocalStorage()
+        values = storage.snapshot()
 
-        return rv
+        @asyncio.coroutine
+        def call(name):
+            storage.update(values)
+            yield from self._call_meth(name, entry)
+            return storage.snapshot()
 
-    @asyncio.coroutine
-    def _apply_cp(self, scope):
+        loop = values['request'].app.loop
+        tasks = [loop.create_task(call(name)) for name in names]
 
-        # Apply all the sec checkpoints associated with the specified scope.
+        # keep track of the completion order
+        finished = []
+        for task in tasks:
+            task.add_done_callback(finished.append)
 
-        for name, verbs in self._sec_scope.get(scope, ()):
-            if verbs is None or request.method in verbs:
-                yield from self._call_meth(name)
+        try:
+            yield from asyncio.wait(tasks, loop=loop,
+                                    return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
-    @asyncio.coroutine
-    def _apply_filters(self, scope):
+        # some tasks may be done without their callbacks having run yet
+        finished.extend(task for task in tasks
+                        if task.done() and task not in finished)
+
+        errors = [task.exception() for task in finished
+                  if not task.cancelled()]
+        for exc in errors:
+            if exc is not None:
+                raise exc
+
+        # the first checkpoint of the group to set a new value wins
+        merged = {}
+        for task in tasks:
+            for name, attr in task.result().items():
+                if name not in values:
+                    merged.setdefault(name, attr)
+        storage.update(merged)
+
+    def _plan_cp(self, scope, method, entry):
+
+        # The steps applying the sec checkpoints associated with the specified
+        # scope.
+
+        chunks = []
+        for name, verbs, group in self._sec_scope.get(scope, ()):
+
+            if not (verbs is None or method in verbs):
+                continue
+
+            if group is not None and chunks and chunks[-1][0] == group:
+                chunks[-1][1].append(name)
+            else:
+                chunks.append((group, [name]))
+
+        return [(self, names[0] if len(names) == 1 else tuple(names), entry,
+                 None) for _, names in chunks]
+
+    def _plan_filters(self, scope, entry):
 
         filters = sorted(self._fltrs.get(scope, ()), key=lambda t: t[-1])
-        for name, _, key in filters:
+        return [(self, name, entry, self.name if key is None else key)
+                for name, _, key in filters]
+
+    def dispatch_plan(self, endpoint, method):
+        """
+        Return the list of steps processing a request for an endpoint and a
+        HTTP method, from the provider to the last one of the processing
+        chain.
+
+        Each step is a tuple ``(provider, name, entry, key)`` where `name` is
+        the method of the `provider` to call, `entry` tells if the provider is
+        the entry point of the chain and `key` is the key of
+        ``request.m_filters`` where the returned value of a filter is stored
+        (`None` for the checkpoints and the final handler). A group of
+        concurrent checkpoints is a single step where `name` is a tuple.
+
+        The plans are compiled once and kept by the provider.
+        """
+
+        if self._plans is None:
+            self._plans = {}
+
+        plan = self._plans.get((endpoint, method))
+        if plan is not None:
+            return plan
+
+        plan = []
+        provider = self
+
+        while True:
+
+            rule, target, entry = provider._subrules.get(
+                endpoint, (None, None, False))
+            entry = entry or endpoint == provider.name
+
+            plan += provider._plan_cp(provider.ALWAYS, method, entry)
+            if entry:
+                plan += provider._plan_cp(provider.ENTRY, method, entry)
+            else:
+                plan += provider._plan_cp(provider.PATH, method, entry)
+
+            if target is None:
+                plan.append((provider, method.lower(), entry, None))
+                break
+
+            plan += provider._plan_cp(rule, method, entry)
+            plan += provider._plan_cp(provider.TRANSFER, method, entry)
+            plan += provider._plan_filters(provider.ALWAYS, entry)
+            plan += provider._plan_filters(rule, entry)
 
-            if key is None:
-                key = self.name
+            provider = target
 
-            request.m_filters[key] = yield from self._call_meth(name)
+        self._plans[endpoint, method] = plan = tuple(plan)
+        return plan
 
+    @classmethod
+    def limiter(cls):
+        """
+        Return the :class:`~hypr.limits.Limiter` of the provider or `None`
+        if its concurrency isn't limited.
+
+        The limit applies to the requests for which the provider runs the
+        final handler. The requests exceeding the queue are rejected with a
+        ``503 Service Unavailable`` error.
+        """
+
+        if cls._limiter is None and cls.max_concurrency is not None:
+            cls._limiter = Limiter(cls.max_concurrency, cls.max_queue)
+        return cls._limiter
 
     @asyncio.coroutine
     def local_dispatcher(self, request):
         """
+        Process a request with the dispatch plan of its endpoint, within the
+        concurrency limits of the final provider and of the application.
         """
 
-        ep = request.match_info.route.endpoint
-        rule, target, _ = self._subrules.get(ep, (None, None, False))
+        plan = self.dispatch_plan(request.match_info.route.endpoint,
+                                  request.method)
 
-        yield from self._apply_cp(self.ALWAYS)
-        if self.is_entry:
-            yield from self._apply_cp(self.ENTRY)
-        else:
-            yield from self._apply_cp(self.PATH)
-
-        if target is not None:
-            yield from self._apply_cp(rule)
-            yield from self._apply_cp(self.TRANSFER)
-            yield from self._apply_filters(self.ALWAYS)
-            yield from self._apply_filters(rule)
-            rv = yield from target.local_dispatcher(request)
-        else:
-            rv = yield from self._call_meth(request.method.lower())
+        # the limiters are always acquired in the same order
+        app = request.app
+        limiters = [l for l in (plan[-1][0].limiter(), app.limiter)
+                    if l is not None]
+
+        if not limiters:
+            return (yield from self._run_plan(request, plan))
+
+        acquired = yield from acquire_all(limiters, app.loop)
+        if acquired is None:
+            retry_after = str(app.config['RETRY_AFTER'])
+            raise HTTPServiceUnavailable(headers={'Retry-After': retry_after})
+
+        try:
+            return (yield from self._run_plan(request, plan))
+        finally:
+            release_all(acquired)
+
+    @asyncio.coroutine
+    def _run_plan(self, request, plan):
+
+        timings = request.m_timings
+        last = len(plan) - 1
+
+        rv = None
+        for i, (provider, name, entry, key) in enumerate(plan):
+            stage = 'filter' if key is not None else \
+                'handler' if i == last else 'checkpoint'
+            with timings.measure(stage, name, provider):
+                if isinstance(name, tuple):
+                    rv = yield from provider._call_group(name, entry)
+                else:
+                    rv = yield from provider._call_meth(name, entry)
+            if key is not None:
+                request.m_filters[key] = rv
 
         return rv
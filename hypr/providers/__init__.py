@@ -8,6 +8,7 @@ hypr.providers
 
 
 from hypr.providers.crud import CRUDProvider
+from hypr.providers.metrics import MetricsProvider
 
 
-__all__ = ['CRUDProvider',]
+__all__ = ['CRUDProvider', 'MetricsProvider']
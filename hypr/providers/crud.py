@@ -56,16 +56,37 @@ class CRUDProvider(Provider):
 
         return uid
 
+    def _where(self):
+        """
+        Returns the keyword arguments pushing the mandatory filter of the
+        provider down to its model.
+
+        The mandatory filter stored in ``request.m_filters`` under the name of
+        the provider is a ``dict`` of model filters. Those filters restrict any
+        instance retrieved by the provider, in addition to the ones from the
+        query string. Any other value is left to the provider and isn't pushed
+        down.
+        """
+
+        where = request.m_filters.get(self.name)
+
+        if not isinstance(where, dict):
+            return {}
+
+        return {'_where': where}
+
     @asyncio.coroutine
     def get(self, **kwargs):
 
         model = self.__model__
+        where = self._where()
 
         if len(kwargs):
-            return model.one(*self._uid(**kwargs)) or abort(404)
+            return model.one(*self._uid(**kwargs), **where) or abort(404)
 
         try:
             search, order, limit, offset, fltrs = mini_dsl(request.args)
+            fltrs.update(where)
             count = model.count(_search=search, **fltrs)
             rv = model.get(limit, offset, order, search, **fltrs)
         except ValueError:
@@ -132,7 +153,8 @@ class CRUDProvider(Provider):
 
         elif kwargs:
 
-            rv = model.one(*self._uid(**kwargs)) or abort(404)
+            rv = model.one(*self._uid(**kwargs), **self._where()) or \
+                abort(404)
 
             for k, v in json.items():
                 if hasattr(rv, k):
@@ -166,7 +188,8 @@ class CRUDProvider(Provider):
             # TODO: implement bulk PUT
             raise NotImplementedError()
         elif kwargs:
-            rv = model.one(*self._uid(**kwargs)) or abort(404)
+            rv = model.one(*self._uid(**kwargs), **self._where()) or \
+                abort(404)
             rv.delete(commit=False)
         else:
             abort(400)
@@ -0,0 +1,38 @@
+"""
+hypr.providers.metrics
+----------------------
+
+A provider exposing the metrics of the application.
+
+:copyright: (c) 2015 by Morgan Delahaye-Prat.
+:license: BSD, see LICENSE for more details.
+"""
+
+
+from aiohttp.web import Response
+
+from hypr.globals import current_app
+from hypr.metrics import CONTENT_TYPE
+from hypr.provider import Provider
+from hypr.web_exceptions import abort
+
+
+class MetricsProvider(Provider):
+    """
+    Expose the metrics of the application in the Prometheus text format. The
+    metrics have to be enabled on the application::
+
+        app.metrics = Metrics()
+        app.router.add_provider(MetricsProvider, '/metrics')
+
+    The metrics aren't available (404) when disabled.
+    """
+
+    def get(self):
+
+        metrics = current_app.metrics
+        if metrics is None:
+            abort(404)
+
+        body = metrics.render(current_app.router.cache_info())
+        return Response(text=body, content_type=CONTENT_TYPE)
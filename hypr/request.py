@@ -15,6 +15,7 @@ from aiohttp.abc import AbstractMatchInfo
 from aiohttp.web import RequestHandler as BaseRequestHandler
 from aiohttp.web_reqrep import Request as BaseRequest
 from aiohttp.web import *
+from hypr.timing import Timings, NO_TIMINGS
 
 
 class Request(BaseRequest):
@@ -23,6 +24,8 @@ class Request(BaseRequest):
 
         super().__init__(*args, **kwargs)
         self.m_filters = {}
+        self.m_memo = {}
+        self.m_timings = NO_TIMINGS
 
     @property
     def args(self):
@@ -52,33 +55,62 @@ class RequestHandler(BaseRequestHandler):
         self._meth = request.method
         self._path = request.path
 
-        try:
-            match_info = yield from self._router.resolve(request)
-
-            assert isinstance(match_info, AbstractMatchInfo), match_info
-
-            resp = None
-            request._match_info = match_info
-            expect = request.headers.get(hdrs.EXPECT)
-            if expect and expect.lower() == "100-continue":
-                resp = (
-                    yield from match_info.route.handle_expect_header(request))
+        server_timing = app.config['SERVER_TIMING']
+        if server_timing or app.timing_hooks:
+            request.m_timings = Timings()
+        timings = request.m_timings
 
-            if resp is None:
-                handler = match_info.handler
-                for factory in reversed(self._middlewares):
-                    handler = yield from factory(app, handler)
-                resp = yield from handler(request)
+        metrics = app.metrics
+        if metrics is not None:
+            metrics.start(request)
+            started = self._loop.time()
 
-            assert isinstance(resp, StreamResponse), \
-                ("Handler {!r} should return response instance, "
-                 "got {!r} [middlewares {!r}]").format(
-                     match_info.handler, type(resp), self._middlewares)
-        except HTTPException as exc:
-            resp = exc
+        # the status accounted, `None` if no response is sent (the request is
+        # cancelled or the response can't be written)
+        status = None
 
-        resp_msg = resp.start(request)
-        yield from resp.write_eof()
+        try:
+            try:
+                with timings.measure('resolve'):
+                    match_info = yield from self._router.resolve(request)
+
+                assert isinstance(match_info, AbstractMatchInfo), match_info
+
+                resp = None
+                request._match_info = match_info
+                expect = request.headers.get(hdrs.EXPECT)
+                if expect and expect.lower() == "100-continue":
+                    resp = (yield from
+                            match_info.route.handle_expect_header(request))
+
+                if resp is None:
+                    handler = yield from app.compose_middlewares(
+                        match_info.handler)
+                    resp = yield from handler(request)
+
+                assert isinstance(resp, StreamResponse), \
+                    ("Handler {!r} should return response instance, "
+                     "got {!r} [middlewares {!r}]").format(
+                         match_info.handler, type(resp), self._middlewares)
+            except HTTPException as exc:
+                resp = exc
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                status = 500
+                raise
+
+            if server_timing:
+                resp.headers['Server-Timing'] = timings.header()
+
+            resp_msg = resp.start(request)
+            with timings.measure('write'):
+                yield from resp.write_eof()
+            status = resp.status
+
+        finally:
+            if metrics is not None:
+                metrics.finish(request, status, self._loop.time() - started)
 
         # notify server about keep-alive
         self.keep_alive(resp_msg.keep_alive())
@@ -87,6 +119,13 @@ class RequestHandler(BaseRequestHandler):
         if self.access_log:
             self.log_access(message, None, resp_msg, self._loop.time() - now)
 
+        if timings.enabled:
+            for hook in app.timing_hooks:
+                try:
+                    hook(request, timings)
+                except Exception:
+                    self.logger.exception('Error in a timing hook')
+
         # for repr
         self._meth = 'none'
         self._path = 'none'
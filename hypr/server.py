@@ -0,0 +1,493 @@
+"""
+hypr.server
+-----------
+
+Implements the runners serving an application, either in the current process
+or with a pool of pre-forked worker processes.
+
+:copyright: (c) 2015 by Morgan Delahaye-Prat.
+:license: BSD, see LICENSE for more details.
+"""
+
+
+import asyncio
+import logging
+import os
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+
+logger = logging.getLogger(__name__)
+
+WORKER_BOOT_ERROR = 3
+
+EVENT_LOOPS = 'asyncio', 'uvloop', 'auto'
+
+
+def new_event_loop(name='asyncio'):
+    """
+    Return a new event loop of the implementation `name`:
+
+    .. tabularcolumns:: |p{3.5cm}|p{9.5cm}|
+
+    ======================= ===================================================
+    ``'asyncio'``           the default loop of :mod:`asyncio`
+    ``'uvloop'``            the loop of :mod:`uvloop` (must be installed)
+    ``'auto'``              :mod:`uvloop` if it's installed, :mod:`asyncio`
+                            otherwise
+    ======================= ===================================================
+    """
+
+    if name not in EVENT_LOOPS:
+        raise ValueError('Unknown event loop {!r}'.format(name))
+
+    if name != 'asyncio':
+        try:
+            import uvloop
+        except ImportError:
+            if name == 'uvloop':
+                raise
+        else:
+            return uvloop.new_event_loop()
+
+    return asyncio.new_event_loop()
+
+
+def bind_socket(host, port, reuse_port=False, backlog=100):
+    """
+    Return a non-blocking TCP socket listening on `host` and `port`.
+
+    With `reuse_port`, the ``SO_REUSEPORT`` option is set to allow several
+    sockets to listen on the same address.
+    """
+
+    family, type_, proto, _, addr = socket.getaddrinfo(
+        host, port, socket.AF_UNSPEC, socket.SOCK_STREAM, 0,
+        socket.AI_PASSIVE)[0]
+
+    sock = socket.socket(family, type_, proto)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            if not hasattr(socket, 'SO_REUSEPORT'):
+                raise ValueError('SO_REUSEPORT is not supported')
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(addr)
+        sock.listen(backlog)
+        sock.setblocking(False)
+    except:
+        sock.close()
+        raise
+
+    return sock
+
+
+@asyncio.coroutine
+def drain_connections(handler, timeout):
+    """
+    Give the connections of a request handler factory `timeout` seconds to
+    finish their in-flight requests, then close the remaining ones.
+
+    Returns a tuple ``(drained, aborted)`` of the number of connections
+    closed gracefully or not.
+    """
+
+    loop = asyncio.get_event_loop()
+    connections = handler.connections
+
+    # the idle connections are closed at once, the busy ones are left to
+    # finish on their own (no timer of their own racing with the deadline)
+    for conn in connections:
+        conn.closing(timeout=None)
+
+    deadline = loop.time() + timeout
+    while handler.connections and loop.time() < deadline:
+        yield from asyncio.sleep(0.05)
+
+    aborted = len(handler.connections)
+    yield from handler.finish_connections()
+
+    return len(connections) - aborted, aborted
+
+
+def serve(app, sock, graceful_timeout=1.0):
+    """
+    Serve the application on a listening socket until the process receives
+    ``SIGTERM`` or ``SIGINT``.
+
+    The socket is then closed and the connections are given `graceful_timeout`
+    seconds to finish their in-flight requests. Returns the outcome of
+    :func:`drain_connections`.
+    """
+
+    loop = app.loop
+    handler = app.make_handler()
+    srv = loop.run_until_complete(loop.create_server(handler, sock=sock))
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, loop.stop)
+
+    try:
+        loop.run_forever()
+    finally:
+        srv.close()
+        rv = loop.run_until_complete(
+            drain_connections(handler, graceful_timeout))
+        loop.run_until_complete(srv.wait_closed())
+        loop.run_until_complete(app.finish())
+    loop.close()
+
+    return rv
+
+
+class Prefork:
+    """
+    Serve an application with a pool of worker processes.
+
+    The rules of the application are propagated by the parent process before
+    forking (unless it's already done), the workers inherit the compiled
+    routing table. Unless
+    `reuse_port` is set, the listening socket is also bound by the parent and
+    shared by the workers. Otherwise, each worker binds its own socket with
+    ``SO_REUSEPORT`` and the kernel balances the connections between them.
+
+    The parent process supervises the workers:
+
+    * a worker exiting unexpectedly is replaced by a new one, the crashed
+      workers are replaced at most once every `restart_interval` seconds,
+    * ``SIGTERM`` and ``SIGINT`` stop the workers gracefully, the workers
+      still alive after `graceful_timeout` seconds are killed,
+    * ``SIGHUP`` reloads the workers without downtime: the configuration
+      files of the application are read again, a new generation of workers
+      is started and the previous one stops accepting connections and
+      drains its in-flight requests before exiting.
+
+    The workers report the number of connections they drained or aborted
+    when stopping, the totals are kept in :attr:`drained` and
+    :attr:`aborted`. When the metrics of the application are enabled, the
+    workers share their snapshots through the directory of the metrics (a
+    temporary one if not set).
+
+    A worker failing to boot stops the whole pool. The events of the pool
+    are logged by the ``hypr.server`` logger.
+    """
+
+    SIGNALS = 'SIGCHLD', 'SIGTERM', 'SIGINT', 'SIGHUP'
+
+    def __init__(self, app, host, port, workers, reuse_port=False,
+                 graceful_timeout=10.0, event_loop='asyncio',
+                 restart_interval=1.0):
+
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.reuse_port = reuse_port
+        self.graceful_timeout = graceful_timeout
+        self.event_loop = event_loop
+        self.restart_interval = restart_interval
+
+        self.workers = {}       # pid -> start time
+        self.retiring = {}      # pid -> drain deadline
+        self.sock = None
+
+        self.reloads = 0
+        self.drained = 0
+        self.aborted = 0
+
+        self._running = False
+        self._signals = []
+        self._pipe = None
+        self._stats = None
+        self._buffer = b''
+        self._crashed = False
+        self._restarted = None
+
+    def run(self):
+        """
+        Start the workers and supervise them until the pool is stopped.
+        """
+
+        if not hasattr(os, 'fork'):
+            raise RuntimeError('The prefork mode requires os.fork()')
+
+        import fcntl
+
+        if not self.app._propagated:
+            self.app.propagate()
+
+        if not self.reuse_port:
+            self.sock = bind_socket(self.host, self.port)
+
+        metrics, tmpdir = self.app.metrics, None
+        if metrics is not None and metrics.directory is None:
+            metrics.directory = tmpdir = tempfile.mkdtemp(prefix='hypr-')
+
+        # the first pipe wakes the parent up when a signal is received and
+        # the workers report their stats through the second one
+        self._pipe = os.pipe()
+        self._stats = os.pipe()
+        for fd in self._pipe + self._stats[:1]:
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+        handlers = {s: signal.signal(s, self._signal) for s in self.signals}
+
+        logger.info('Listening on %s:%s with %d workers', self.host,
+                    self.port, self.num_workers)
+
+        self._running = True
+        try:
+            self.manage_workers()
+            while self._running:
+                self._wait(1.0)
+                while self._signals:
+                    self.handle_signal(self._signals.pop(0))
+                self.reap_workers()
+                self.kill_overdue()
+                if self._running:
+                    self.manage_workers()
+        finally:
+            self.stop()
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            self._read_stats()
+            for fd in self._pipe + self._stats:
+                os.close(fd)
+            if self.sock is not None:
+                self.sock.close()
+            if tmpdir is not None:
+                metrics.directory = None
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+    @property
+    def signals(self):
+        return tuple(getattr(signal, name) for name in self.SIGNALS)
+
+    def _signal(self, signum, frame):
+
+        # Only queue the signal and wake the supervision loop up.
+
+        self._signals.append(signum)
+        try:
+            os.write(self._pipe[1], b'.')
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _wait(self, timeout):
+
+        try:
+            ready, _, _ = select.select([self._pipe[0], self._stats[0]], [],
+                                        [], timeout)
+        except InterruptedError:
+            return
+
+        if self._pipe[0] in ready:
+            try:
+                while os.read(self._pipe[0], 512):
+                    pass
+            except (BlockingIOError, InterruptedError):
+                pass
+
+        if self._stats[0] in ready:
+            self._read_stats()
+
+    def _read_stats(self):
+
+        # Each worker writes a line ``drained aborted`` when it stops.
+
+        try:
+            while True:
+                data = os.read(self._stats[0], 512)
+                if not data:
+                    break
+                self._buffer += data
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        *lines, self._buffer = self._buffer.split(b'\n')
+        for line in lines:
+            drained, aborted = line.split()
+            self.drained += int(drained)
+            self.aborted += int(aborted)
+
+    def handle_signal(self, signum):
+
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            self._running = False
+        elif signum == signal.SIGHUP and self._running:
+            self.reload()
+
+    def reload(self):
+        """
+        Replace the workers by a new generation running with the reloaded
+        configuration of the application.
+        """
+
+        try:
+            self.app.config.reload()
+        except Exception:
+            # keep the current workers
+            logger.exception('Unable to reload the configuration')
+            return
+
+        self.reloads += 1
+        logger.info('Reloading the workers')
+
+        # the new generation is started at once
+        old, self.workers = self.workers, {}
+        self._crashed = False
+        self.manage_workers()
+
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in old:
+            self.retiring[pid] = deadline
+        self.kill_workers(signal.SIGTERM, old)
+
+    def kill_overdue(self):
+        """
+        Kill the retiring workers still draining after their deadline.
+        """
+
+        now = time.monotonic()
+        overdue = [pid for pid, deadline in self.retiring.items()
+                   if deadline + 1.0 < now]
+        self.kill_workers(signal.SIGKILL, overdue)
+
+    def manage_workers(self):
+        """
+        Spawn the missing workers.
+        """
+
+        if self._crashed:
+            now = time.monotonic()
+            if self._restarted is not None and \
+                    now - self._restarted < self.restart_interval:
+                return
+            self._restarted = now
+            self._crashed = False
+
+        while len(self.workers) < self.num_workers:
+            self.spawn_worker()
+
+    def reap_workers(self):
+        """
+        Collect the exited workers and return their pids.
+        """
+
+        rv = []
+        while True:
+
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+
+            if not pid:
+                break
+
+            if self.workers.pop(pid, None) is not None:
+                self._crashed = self._running
+            elif self.retiring.pop(pid, None) is None:
+                continue
+            rv.append(pid)
+
+            if self.app.metrics is not None:
+                self.app.metrics.retire(pid)
+
+            if os.WIFEXITED(status) and \
+                    os.WEXITSTATUS(status) == WORKER_BOOT_ERROR:
+                logger.error('Worker %d failed to boot', pid)
+                self._running = False
+            elif self._crashed:
+                logger.warning('Worker %d exited unexpectedly', pid)
+
+        return rv
+
+    def kill_workers(self, signum, pids=None):
+
+        if pids is None:
+            pids = list(self.workers) + list(self.retiring)
+
+        for pid in list(pids):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+                self.retiring.pop(pid, None)
+
+    def stop(self):
+        """
+        Stop the workers gracefully and wait for them.
+        """
+
+        self._running = False
+        self.kill_workers(signal.SIGTERM)
+
+        # the workers are given a little more than the graceful timeout to
+        # close the connections left and report
+        deadline = time.monotonic() + self.graceful_timeout + 1.0
+        while (self.workers or self.retiring) and \
+                time.monotonic() < deadline:
+            self.reap_workers()
+            time.sleep(0.05)
+
+        self.kill_workers(signal.SIGKILL)
+        while self.workers or self.retiring:
+            self.reap_workers()
+            time.sleep(0.05)
+
+    def spawn_worker(self):
+        """
+        Fork a new worker and return its pid.
+        """
+
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return pid
+
+        # in the worker process
+        status = WORKER_BOOT_ERROR
+        try:
+            sock = self.init_worker()
+            status = 1
+            stats = serve(self.app, sock, self.graceful_timeout)
+            if self.app.metrics is not None:
+                self.app.metrics.flush(self.app.router.cache_info())
+            os.write(self._stats[1], '{} {}\n'.format(*stats).encode())
+            status = 0
+        except SystemExit as exc:
+            status = exc.code if isinstance(exc.code, int) else 1
+        except BaseException:
+            logger.exception('Worker %d crashed', os.getpid())
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    def init_worker(self):
+        """
+        Prepare a freshly forked worker and return its listening socket.
+        """
+
+        for signum in self.signals:
+            signal.signal(signum, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for fd in self._pipe + self._stats[:1]:
+            os.close(fd)
+
+        # the event loop of the parent is not shared with the workers
+        self.app.loop.close()
+        self.app._set_loop(new_event_loop(self.event_loop))
+        if self.app.metrics is not None:
+            self.app.metrics.reset()
+
+        if self.reuse_port:
+            return bind_socket(self.host, self.port, reuse_port=True)
+        return self.sock
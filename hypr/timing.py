@@ -0,0 +1,100 @@
+"""
+hypr.timing
+-----------
+
+Records the duration of the stages processing a request: the resolution of
+the route, the checkpoints, the filters, the final handler of the provider,
+the serialization of the returned value and the writing of the response.
+
+:copyright: (c) 2015 by Morgan Delahaye-Prat.
+:license: BSD, see LICENSE for more details.
+"""
+
+
+import time
+
+
+class _Measure:
+
+    __slots__ = '_timings', '_stage', '_label', '_start'
+
+    def __init__(self, timings, stage, label):
+        self._timings = timings
+        self._stage = stage
+        self._label = label
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._timings.append((self._stage, self._label,
+                              time.perf_counter() - self._start))
+
+
+class _NoMeasure:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, tb):
+        pass
+
+
+class Timings(list):
+    """
+    The ``(stage, label, duration)`` recorded for a request, in the order the
+    stages ended. The durations are in seconds, measured with the monotonic
+    clock :func:`time.perf_counter`.
+
+    ============== ============================================================
+    ``resolve``    the resolution of the route by the dispatcher
+    ``checkpoint`` a checkpoint (or a group of concurrent ones)
+    ``filter``     a filter
+    ``handler``    the final handler of the provider
+    ``serialize``  the serialization of the returned value
+    ``write``      the writing of the response
+    ============== ============================================================
+    """
+
+    enabled = True
+
+    def measure(self, stage, name=None, provider=None):
+        """
+        Return a context manager recording the duration of its block as a
+        `stage`. The label is made of the `name` of the method called and the
+        name of its `provider`.
+        """
+
+        if isinstance(name, tuple):
+            name = '+'.join(name)
+        if provider is not None:
+            name = '{}.{}'.format(provider.name, name)
+        return _Measure(self, stage, name)
+
+    def header(self):
+        """
+        Return the recorded timings as a ``Server-Timing`` header value, the
+        durations are in milliseconds.
+        """
+
+        return ', '.join(
+            '{};dur={:.3f}'.format(stage, duration * 1000) +
+            ('' if label is None else ';desc="{}"'.format(label))
+            for stage, label, duration in self)
+
+
+class _NoTimings(tuple):
+
+    # Stands for the timings of a request when they aren't recorded, the
+    # measures cost a method call.
+
+    enabled = False
+    _measure = _NoMeasure()
+
+    def measure(self, stage, name=None, provider=None):
+        return self._measure
+
+
+NO_TIMINGS = _NoTimings()
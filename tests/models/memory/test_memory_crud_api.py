@@ -2,6 +2,7 @@ import pytest
 import json
 
 from hypr.models import MemoryModel
+from hypr import Provider as BaseProvider, filter
 from hypr.providers import CRUDProvider
 
 
@@ -18,6 +19,24 @@ class Provider(CRUDProvider):
     __model__ = Model
 
 
+class Scope(BaseProvider):
+
+    propagation_rules = {'users': Provider}
+
+    @filter('Provider')
+    def max_id(self, max_id):
+        return {'id': tuple(range(1, max_id + 1))}
+
+
+class Legacy(BaseProvider):
+
+    propagation_rules = {'users': Provider}
+
+    @filter('Provider')
+    def ids(self):
+        return [1, 2, 3]
+
+
 model_under_test = Model
 
 
@@ -142,3 +161,50 @@ class TestMemoryCrudAPI:
             assert resp.status == 204
             resp = client.get('/test/50')
             assert resp.status == 404
+
+
+@pytest.mark.usefixtures('filled_db')
+class TestMemoryCrudAPIFilterPushdown:
+
+    providers = {
+        Provider: ('/test', '/test/<int:id>'),
+        Scope: '/scope/<int:max_id>',
+        Legacy: '/legacy',
+    }
+
+    def test_get_collection(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/scope/3/test?_limit=5')
+            vtt = json.loads(resp.text)
+
+            assert resp.status == 200
+            assert vtt['count'] == 3
+            assert sorted(obj['id'] for obj in vtt['result']) == [1, 2, 3]
+
+    def test_get_filtered_collection(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/scope/3/test?name=user1,user5')
+            vtt = json.loads(resp.text)
+
+            assert resp.status == 200
+            assert vtt['count'] == 1
+            assert vtt['result'][0]['name'] == 'user1'
+
+    def test_get_resource(self, app):
+
+        with app.test_client() as client:
+            assert client.get('/scope/3/test/2').status == 200
+            assert client.get('/scope/3/test/5').status == 404
+            assert client.get('/test/5').status == 200
+
+    def test_get_unfiltered_collection(self, app):
+
+        # only a dict is pushed down to the model
+        with app.test_client() as client:
+            resp = client.get('/legacy/test?_limit=5')
+            vtt = json.loads(resp.text)
+
+            assert resp.status == 200
+            assert vtt['count'] == 1000
@@ -2,6 +2,7 @@ import pytest
 
 
 from hypr.models import MemoryModel
+from hypr.models.base import BaseModel
 from hypr.providers import CRUDProvider
 from hypr.exc import ModelSearchException, ModelFilterException, \
     ModelConflictException
@@ -115,6 +116,35 @@ class TestMemoryModelAPI_1:
         assert len(vtt) == 1
         assert vtt[0].name == 'user17'
 
+    def test_get_where(self):
+
+        vtt = Model.get(name=('user17', 'user483'), _where={'id': (18, 20)})
+
+        assert len(vtt) == 1
+        assert vtt[0].name == 'user17'
+
+    def test_count_where(self):
+
+        vtt = Model.count(_where={'id': (1, 2, 3)})
+
+        assert vtt == 3
+
+    def test_count_not_copied(self, monkeypatch):
+
+        def checkout(self):
+            raise AssertionError('copied')
+
+        monkeypatch.setattr(Model, '_checkout', checkout)
+
+        assert Model.count() == 1000
+        assert Model.count(name=('user17', 'user483', 'missing')) == 2
+        assert Model.count(_where={'id': (1, 2, 3)}, name='user1') == 1
+
+    def test_one_where(self):
+
+        assert Model.one(18, _where={'name': 'user17'}).id == 18
+        assert Model.one(18, _where={'name': 'user18'}) is None
+
     @pytest.mark.usefixtures('make_model_filtered')
     def test_get_explicit_filters(self):
 
@@ -124,10 +154,47 @@ class TestMemoryModelAPI_1:
         assert '`id`' in str(exc)
 
     @pytest.mark.usefixtures('make_model_searchable')
-    def test_get_search_always_fail(self):
+    def test_get_search_one_term(self):
 
-        with pytest.raises(ModelSearchException):
-            Model.get(_search='user555')
+        vtt = Model.get(_search='user555')
+
+        assert len(vtt) == 1
+
+    @pytest.mark.usefixtures('make_model_searchable')
+    def test_get_search_multiple_term(self):
+
+        vtt = Model.get(_search=('user555', 'user443'))
+
+        assert len(vtt) == 2
+
+    @pytest.mark.usefixtures('make_model_searchable')
+    def test_get_search_substring(self):
+
+        assert len(Model.get(_search='er99', _limit=100)) == 11
+        assert len(Model.get(_search='99', _limit=100)) == 19
+        assert Model.get(_search='User1') == []
+
+    @pytest.mark.usefixtures('make_model_searchable')
+    def test_get_search_filtered(self):
+
+        vtt = Model.get(_search='user55', id=(556, 557, 600))
+
+        assert [obj.id for obj in vtt] == [556, 557]
+        assert Model.count(_search='user55', _where={'id': 600}) == 0
+
+    @pytest.mark.usefixtures('make_model_searchable')
+    def test_get_search_updated(self):
+
+        Model.get(_search='user5')
+        target = Model.one(6)
+        target.name = 'modified'
+        target.save()
+        Model.one(7).delete()
+
+        assert Model.count(_search='user5') == 110
+        assert Model.count(_search='user6') == 110
+        assert 7 not in (obj.id for obj in Model.get(_search='user6'))
+        assert Model.get(_search='dif')[0].id == 6
 
     def test_delete_autocommit(self):
 
@@ -187,3 +254,217 @@ class TestMemoryModelAPI_1:
             target = Model.one(1)
             target.id = 3
             target.save()
+
+
+@pytest.mark.usefixtures('empty_db')
+class TestMemoryModelSnapshots:
+
+    def test_committed_copy(self):
+
+        model = Model(id=1, name='test')
+        model.save()
+        model.name = 'modified'
+
+        vtt = Model.one(1)
+        assert vtt.name == 'test'
+
+        vtt.name = 'modified'
+        assert Model.one(1).name == 'test'
+
+    def test_mutable_properties(self):
+
+        Model(id=2, name=['test']).save()
+
+        vtt = Model.one(2)
+        vtt.name.append('modified')
+
+        assert Model.one(2).name == ['test']
+
+
+class Indexed(MemoryModel):
+
+    __key__ = 'id'
+    __indexes__ = 'name', 'group'
+    __orderable__ = 'name', 'group'
+
+    def __init__(self, id, name, group=None):
+        super().__init__(id=id, name=name, group=group)
+
+
+class TestMemoryModelIndexes:
+
+    def setup_method(self, method):
+
+        Indexed.reset()
+        for i in range(20):
+            Indexed(id=i, name='user{}'.format(i), group=i % 3).save(False)
+        Indexed.commit()
+
+    def teardown_method(self, method):
+        Indexed.reset()
+
+    def test_lookup(self):
+
+        vtt = Indexed.get(name=('user4', 'user7', 'user9'), group=(0, 1))
+        assert [obj.id for obj in vtt] == [4, 7, 9]
+
+        vtt = Indexed.get(group=2, id=(5, 8, 9), _limit=20)
+        assert [obj.id for obj in vtt] == [5, 8]
+
+    def test_order(self):
+
+        vtt = Indexed.get(group=0, _limit=3, _offset=1)
+        assert [obj.id for obj in vtt] == [3, 6, 9]
+
+    def test_update(self):
+
+        target = Indexed.one(4)
+        target.group = 2
+        target.save()
+
+        assert 4 not in [obj.id for obj in Indexed.get(group=1, _limit=20)]
+        assert 4 in [obj.id for obj in Indexed.get(group=2, _limit=20)]
+        assert Indexed.get(group=2, _limit=3)[1].id == 4
+
+    def test_delete(self):
+
+        Indexed.one(3).delete()
+
+        assert Indexed.get(name='user3') == []
+        assert len(Indexed.get(group=0, _limit=20)) == 6
+
+    def test_insert(self):
+
+        Indexed(id=20, name='user20', group=0).save()
+
+        assert Indexed.get(group=0, _limit=20)[-1].id == 20
+        assert Indexed.one(20, _where={'name': 'user20'})
+
+    def test_unhashable(self):
+
+        Indexed(id=21, name='user21', group=[0]).save()
+
+        assert Indexed.get(group=[0])[0].id == 21
+        assert len(Indexed.get(group=0, _limit=20)) == 7
+
+    def test_missing_property(self):
+
+        obj = Indexed(id=21, name='user21')
+        del obj.group
+        obj.save()
+
+        with pytest.raises(ModelFilterException):
+            Indexed.get(group=0)
+        with pytest.raises(ModelFilterException):
+            Indexed.count(group=0)
+
+        # not reached by the other filters
+        assert Indexed.count(name='user3', group=0) == 1
+
+        Indexed.one(21).delete()
+        assert Indexed.count(group=0) == 7
+
+    def test_count(self):
+
+        assert Indexed.count(group=(0, 1)) == 14
+        assert Indexed.count(group=0, _where={'id': (3, 4, 6)}) == 2
+
+        Indexed(id=21, name='user21', group=[0]).save()
+        assert Indexed.count(group=0) == 7
+        assert Indexed.count(group=([0], 1)) == 8
+
+    def test_indexed_fields_changed(self):
+
+        Indexed.get(name='user1')
+        Indexed.__indexes__ = 'group',
+        try:
+            Indexed(id=22, name='user22', group=1).save()
+            assert Indexed.get(name='user22')[0].id == 22
+            assert Indexed.get(group=1, _limit=20)[-1].id == 22
+        finally:
+            Indexed.__indexes__ = 'name', 'group'
+
+    def test_get_order(self):
+
+        vtt = Indexed.get(_order='!name', _limit=3)
+        assert [obj.name for obj in vtt] == ['user9', 'user8', 'user7']
+
+        vtt = Indexed.get(_order=('group', '!name'), _limit=4, _offset=5)
+        assert [(obj.group, obj.name) for obj in vtt] == [
+            (0, 'user12'), (0, 'user0'), (1, 'user7'), (1, 'user4')]
+
+    def test_get_order_not_orderable(self):
+
+        vtt = Indexed.get(_order=('!id',), _limit=2)
+        assert [obj.id for obj in vtt] == [19, 18]
+
+        vtt = Indexed.get(_order=('group', '!id'), _limit=2)
+        assert [obj.id for obj in vtt] == [18, 15]
+
+    def test_get_order_filtered(self):
+
+        # a few candidates are sorted, the others follow the ordered index
+        for filters in ({'name': ('user3', 'user14', 'user9')},
+                        {'group': (0, 1, 2), 'id': (3, 14, 9)}):
+            vtt = Indexed.get(_order='!name', **filters)
+            assert [obj.id for obj in vtt] == [9, 3, 14]
+
+    def test_get_order_updated(self):
+
+        target = Indexed.one(5)
+        target.name = 'user0'
+        target.save()
+        Indexed.one(0).delete()
+        for i in range(20, 120):
+            Indexed(id=i, name='user{:03}'.format(i), group=i % 3).save(False)
+        Indexed.commit()
+
+        expected = sorted(obj.name for obj in Indexed.get(_limit=100) +
+                          Indexed.get(_limit=100, _offset=100))
+        vtt = Indexed.get(_order='name', _limit=100)
+        vtt += Indexed.get(_order='name', _limit=100, _offset=100)
+
+        assert [obj.name for obj in vtt] == expected
+        assert vtt[0].id == 5
+
+
+class Paged(BaseModel):
+
+    __key__ = 'id'
+
+    def __init__(self, id):
+        self.id = id
+
+    @classmethod
+    def get(cls, _limit=0, _offset=0, _order=None, _search=None, _where=None,
+            **kwargs):
+        return [cls(i) for i in range(250)][_offset:_offset+_limit]
+
+
+class Counted(Paged):
+
+    @classmethod
+    def __count__(cls, _search=None, _where=None, **kwargs):
+        if not kwargs:
+            return 250
+
+
+class TestBaseModelCount:
+
+    def test_paged(self):
+
+        assert Paged.count() == 250
+
+    def test_count_hook(self, monkeypatch):
+
+        calls = []
+        get = Counted.get.__func__
+        monkeypatch.setattr(Counted, 'get', classmethod(
+            lambda cls, **kw: calls.append(kw) or get(cls, **kw)))
+
+        assert Counted.count() == 250
+        assert calls == []
+
+        # the hook can't answer, the instances are paged
+        assert Counted.count(id=1) == 250
+        assert len(calls) == 4
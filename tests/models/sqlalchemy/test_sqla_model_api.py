@@ -142,6 +142,28 @@ class TestSQLAlchemyModelAPI_1:
         assert len(vtt) == 1
         assert vtt[0].name == 'user17'
 
+    def test_get_where(self, session):
+
+        vtt = User.get(name=('user17', 'user483'), _where={'id': (18, 20)},
+                       _session=session)
+
+        assert len(vtt) == 1
+        assert vtt[0].name == 'user17'
+
+    def test_count_where(self, session):
+
+        vtt = User.count(_where={'id': (1, 2, 3)}, _session=session)
+
+        assert vtt == 3
+
+    def test_one_where(self, session):
+
+        vtt = User.one(18, _where={'name': 'user17'}, _session=session)
+        assert vtt.id == 18
+
+        vtt = User.one(18, _where={'name': 'user18'}, _session=session)
+        assert vtt is None
+
     @pytest.mark.usefixtures('make_model_filtered')
     def test_get_explicit_filters(self, session):
 
@@ -0,0 +1,292 @@
+import asyncio
+import os
+import pytest
+
+from aiohttp.abc import AbstractMatchInfo
+from aiohttp.web import Response
+from hypr import Hypr, Metrics
+from hypr.providers import MetricsProvider
+from hypr.request import RequestHandler
+from hypr.timing import NO_TIMINGS
+from test_tools import ProviderTemplate
+
+
+class Route:
+
+    def __init__(self, url):
+        self.url = url
+
+
+class MatchInfo:
+
+    def __init__(self, url):
+        self.route = Route(url)
+
+
+class Request:
+
+    def __init__(self, url, method='GET', app=None):
+        self.match_info = None if url is None else MatchInfo(url)
+        self.method = method
+        self.app = app
+
+
+class HandledRequest:
+
+    def __init__(self, app, message, payload, *args, **kwargs):
+        self.app = app
+        self.method = 'GET'
+        self.path = '/a'
+        self.headers = {}
+        self.m_timings = NO_TIMINGS
+        self._match_info = None
+
+    @property
+    def match_info(self):
+        return self._match_info
+
+
+class Handled(AbstractMatchInfo):
+
+    def __init__(self, handler):
+        self._handler = handler
+
+    @property
+    def handler(self):
+        return self._handler
+
+    @property
+    def route(self):
+        return Route('/a')
+
+
+class Router:
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    @asyncio.coroutine
+    def resolve(self, request):
+        return Handled(self.handler)
+
+
+class Disconnected(Response):
+
+    def start(self, request):
+        pass
+
+    @asyncio.coroutine
+    def write_eof(self):
+        raise ConnectionResetError()
+
+
+def account(metrics, url, status, duration, method='GET', app=None):
+    request = Request(url, method, app)
+    metrics.start(request)
+    metrics.finish(request, status, duration)
+
+
+@pytest.fixture
+def app():
+
+    app = Hypr()
+    app.router.add_provider(type('Res', (ProviderTemplate,), {}), '/res')
+    app.router.add_provider(MetricsProvider, '/metrics')
+    return app
+
+
+class TestMetrics:
+
+    def test_collect(self):
+
+        metrics = Metrics()
+        account(metrics, '/a', 200, 0.001)
+        account(metrics, '/a', 200, 0.2)
+        account(metrics, '/a', 403, 0.002, method='POST')
+        account(metrics, None, 404, 20)
+        metrics.start(Request('/a'))
+
+        rv = metrics.collect()
+        assert rv['in_flight'] == 1
+        assert rv['requests'] == [['', 'GET', 1], ['/a', 'GET', 2],
+                                  ['/a', 'POST', 1]]
+        assert rv['responses'] == [[200, 2], [403, 1], [404, 1]]
+
+        latencies = dict((r, l) for r, *l in rv['latencies'])
+        assert latencies['/a'][0] == 2          # <= 0.005
+        assert latencies['/a'][5] == 1          # <= 0.25
+        assert latencies['/a'][-1] == pytest.approx(0.203)
+        assert latencies[''][-2] == 1           # +Inf
+
+    def test_render(self):
+
+        metrics = Metrics()
+        account(metrics, '/a', 200, 0.001)
+        account(metrics, '/a', 200, 0.2)
+
+        lines = metrics.render((3, 1, 10, 1)).splitlines()
+
+        assert '# TYPE hypr_request_duration_seconds histogram' in lines
+        assert 'hypr_requests_total{method="GET",route="/a"} 2' in lines
+        assert 'hypr_responses_total{status="200"} 2' in lines
+        assert 'hypr_request_duration_seconds_bucket{le="0.005",route="/a"} 1' \
+            in lines
+        assert 'hypr_request_duration_seconds_bucket{le="+Inf",route="/a"} 2' \
+            in lines
+        assert 'hypr_request_duration_seconds_count{route="/a"} 2' in lines
+        assert 'hypr_requests_in_flight 0' in lines
+        assert 'hypr_route_cache_hits_total 3' in lines
+        assert 'hypr_route_cache_hit_ratio 0.75' in lines
+
+    def test_workers(self, app, tmpdir):
+
+        directory = str(tmpdir)
+
+        worker = Metrics(directory)
+        worker.pid = os.getppid()
+        worker.start(Request('/a'))
+        account(worker, '/a', 200, 0.001, app=app)
+        worker.flush((1, 1, 10, 1))
+
+        exited = Metrics(directory)
+        exited.pid = 2 ** 22 + 1                # not a valid pid
+        exited.start(Request('/a'))
+        account(exited, '/a', 500, 0.001, app=app)
+        exited.flush()
+
+        metrics = Metrics(directory)
+        account(metrics, '/a', 200, 0.001, app=app)
+
+        rv = metrics.collect((1, 0, 10, 1))
+        assert rv['in_flight'] == 1
+        assert rv['requests'] == [['/a', 'GET', 3]]
+        assert rv['responses'] == [[200, 2], [500, 1]]
+        assert rv['cache'] == [2, 1]
+
+    def test_retire(self, app, tmpdir):
+
+        directory = str(tmpdir)
+        pid = 2 ** 22 + 1                       # not a valid pid
+
+        exited = Metrics(directory)
+        exited.pid = pid
+        account(exited, '/a', 500, 0.001, app=app)
+        exited.flush((1, 0, 10, 1))
+
+        metrics = Metrics(directory)
+        metrics.retire(pid)
+        assert sorted(f.basename for f in tmpdir.listdir()) == \
+            ['retired.json']
+
+        # a new worker reusing the pid doesn't overwrite the retired one
+        recycled = Metrics(directory)
+        recycled.pid = pid
+        account(recycled, '/a', 200, 0.001, app=app)
+        recycled.start(Request('/a'))
+        recycled.flush((0, 1, 10, 1))
+
+        rv = metrics.collect()
+        assert rv['requests'] == [['/a', 'GET', 2]]
+        assert rv['responses'] == [[200, 1], [500, 1]]
+        assert rv['cache'] == [1, 1]
+
+        metrics.retire(pid)
+        metrics.retire(pid)                     # already retired
+
+        rv = metrics.collect()
+        assert rv['in_flight'] == 0
+        assert rv['requests'] == [['/a', 'GET', 2]]
+        assert rv['responses'] == [[200, 1], [500, 1]]
+
+    def test_deferred_flush(self, app, tmpdir):
+
+        metrics = Metrics(str(tmpdir), flush_interval=0.01)
+        account(metrics, '/a', 200, 0.001, app=app)
+        account(metrics, '/a', 200, 0.001, app=app)
+        assert tmpdir.listdir() == []
+
+        app.loop.run_until_complete(asyncio.sleep(0.05))
+
+        snapshot, = tmpdir.listdir()
+        assert snapshot.basename == '{}.json'.format(os.getpid())
+
+
+class TestRequestHandler:
+
+    def handle(self, app, handler):
+
+        app.metrics = Metrics()
+        app.request_class = HandledRequest
+        request_handler = RequestHandler(None, app, Router(handler),
+                                         loop=app.loop, access_log=None)
+
+        coro = request_handler.handle_request(None, None)
+        return app.loop.run_until_complete(coro)
+
+    def test_write_error(self, app):
+
+        @asyncio.coroutine
+        def handler(request):
+            return Disconnected(text='ok')
+
+        with pytest.raises(ConnectionResetError):
+            self.handle(app, handler)
+
+        rv = app.metrics.collect()
+        assert rv['in_flight'] == 0
+        assert rv['requests'] == [['/a', 'GET', 1]]
+        assert rv['responses'] == []
+
+    def test_cancelled(self, app):
+
+        @asyncio.coroutine
+        def handler(request):
+            raise asyncio.CancelledError()
+
+        with pytest.raises(asyncio.CancelledError):
+            self.handle(app, handler)
+
+        rv = app.metrics.collect()
+        assert rv['in_flight'] == 0
+        assert rv['responses'] == []
+
+    def test_error(self, app):
+
+        @asyncio.coroutine
+        def handler(request):
+            raise ValueError()
+
+        with pytest.raises(ValueError):
+            self.handle(app, handler)
+
+        rv = app.metrics.collect()
+        assert rv['in_flight'] == 0
+        assert rv['responses'] == [[500, 1]]
+
+
+class TestMetricsProvider:
+
+    def test_disabled(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/metrics')
+            assert resp.status == 404
+
+    def test_metrics(self, app):
+
+        app.metrics = Metrics()
+
+        with app.test_client() as client:
+
+            client.get('/res')
+            client.get('/res')
+            client.get('/missing')
+
+            resp = client.get('/metrics')
+            assert resp.status == 200
+
+            lines = resp.text.splitlines()
+            assert 'hypr_requests_total{method="GET",route="/res"} 2' in lines
+            assert 'hypr_requests_total{method="GET",route=""} 1' in lines
+            assert 'hypr_responses_total{status="404"} 1' in lines
+            assert 'hypr_requests_in_flight 1' in lines
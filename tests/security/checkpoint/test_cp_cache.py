@@ -0,0 +1,94 @@
+import json
+import time
+import pytest
+
+from hypr import Hypr, Provider, CheckpointCache, checkpoint, abort
+
+
+cache = CheckpointCache(lambda request, value: (request.args.get('token'),
+                                                value),
+                        ttl=60, negative_ttl=0.05, maxsize=2)
+
+
+class MyProvider(Provider):
+
+    calls = 0
+
+    @checkpoint(cache=cache)
+    def check_token(self, value):
+        MyProvider.calls += 1
+        if value == 1:
+            abort(403)
+
+    def get(self, value):
+        return value
+
+
+@pytest.fixture(scope='class')
+def app():
+
+    app = Hypr()
+    app.router.add_provider(MyProvider, '/<int:value>')
+    return app
+
+
+@pytest.fixture
+def reset():
+
+    cache.invalidate()
+    MyProvider.calls = 0
+
+
+class TestCheckpointCache:
+
+    def test_positive(self, app, reset):
+
+        with app.test_client() as client:
+
+            for _ in range(3):
+                vtt = client.get('/2?token=a')
+                assert vtt.status == 200
+                assert json.loads(vtt.text) == 2
+
+            assert MyProvider.calls == 1
+
+            client.get('/2?token=b')
+            assert MyProvider.calls == 2
+
+    def test_negative(self, app, reset):
+
+        with app.test_client() as client:
+
+            assert client.get('/1?token=a').status == 403
+            assert client.get('/1?token=a').status == 403
+            assert MyProvider.calls == 1
+
+            # the negative outcome expires earlier
+            time.sleep(0.05)
+            assert client.get('/1?token=a').status == 403
+            assert MyProvider.calls == 2
+
+    def test_invalidate(self, app, reset):
+
+        with app.test_client() as client:
+
+            client.get('/2?token=a')
+            client.get('/3?token=a')
+            assert len(cache) == 2
+
+            cache.invalidate(('a', 2))
+            assert len(cache) == 1
+
+            client.get('/2?token=a')
+            client.get('/3?token=a')
+            assert MyProvider.calls == 3
+
+    def test_maxsize(self, app, reset):
+
+        with app.test_client() as client:
+
+            for value in (2, 3, 4, 2):
+                client.get('/{}?token=a'.format(value))
+
+            assert len(cache) == 2
+            assert MyProvider.calls == 4
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import pytest
+
+from hypr import Hypr, Provider, checkpoint, abort
+from hypr.globals import LocalStorage
+
+
+class MyProvider(Provider):
+
+    log = []
+
+    @checkpoint(priority=0, concurrent=True)
+    def high_priority(self):
+        self.log.append('high')
+
+    @checkpoint(concurrent=True)
+    @asyncio.coroutine
+    def first(self):
+        self.log.append('first')
+        yield from asyncio.sleep(0.01)
+        self.log.append('first done')
+
+    @checkpoint(concurrent=True)
+    @asyncio.coroutine
+    def second(self, value=None):
+        self.log.append('second')
+        if value == 1:
+            abort(403)
+        yield from asyncio.sleep(0)
+        self.log.append('second done')
+
+    @checkpoint(priority=100)
+    def low_priority(self):
+        self.log.append('low')
+
+    def get(self, value=None):
+        return 'ok'
+
+
+class LocalsProvider(Provider):
+
+    @checkpoint(priority=0)
+    def tenant(self):
+        LocalStorage().set('tenant', 'acme')
+
+    @checkpoint(concurrent=True)
+    @asyncio.coroutine
+    def session(self):
+        tenant = LocalStorage().get('tenant')
+        yield from asyncio.sleep(0.01)
+        LocalStorage().set('session', 'session-' + tenant)
+        LocalStorage().set('origin', 'session')
+
+    @checkpoint(concurrent=True)
+    def quota(self):
+        LocalStorage().set('quota', LocalStorage().get('tenant') + '-quota')
+        LocalStorage().set('origin', 'quota')
+        LocalStorage().set('tenant', 'other')
+
+    def get(self):
+        storage = LocalStorage()
+        return {name: storage.get(name)
+                for name in ('tenant', 'session', 'quota', 'origin')}
+
+
+class FailingProvider(Provider):
+
+    @checkpoint(concurrent=True)
+    @asyncio.coroutine
+    def audit(self):
+        yield from asyncio.sleep(0)
+        yield from asyncio.sleep(0)
+        abort(401)
+
+    @checkpoint(concurrent=True)
+    @asyncio.coroutine
+    def token(self):
+        yield from asyncio.sleep(0)
+        abort(403)
+
+    def get(self):
+        return 'ok'
+
+
+@pytest.fixture(scope='class')
+def app():
+
+    app = Hypr()
+    app.router.add_provider(MyProvider, '/test', '/test/<int:value>')
+    app.router.add_provider(LocalsProvider, '/locals')
+    app.router.add_provider(FailingProvider, '/failing')
+    return app
+
+
+class TestConcurrentCheckpoints:
+
+    def test_plan(self, app):
+
+        rule = next(r for r in app.router._rules if r.url == '/test')
+        plan = app.router._providers[rule.endpoint].dispatch_plan(
+            rule.endpoint, 'GET')
+
+        assert [name for _, name, _, _ in plan] == [
+            'high_priority', ('first', 'second'), 'low_priority', 'get']
+
+    def test_expected(self, app):
+
+        del MyProvider.log[:]
+
+        with app.test_client() as client:
+
+            vtt = client.get('/test')
+            assert vtt.status == 200
+
+        assert MyProvider.log == ['high', 'first', 'second', 'second done',
+                                  'first done', 'low']
+
+    def test_cancel_siblings(self, app):
+
+        del MyProvider.log[:]
+
+        with app.test_client() as client:
+
+            vtt = client.get('/test/1')
+            assert vtt.status == 403
+
+        assert MyProvider.log == ['high', 'first', 'second']
+
+    def test_task_locals(self, app):
+
+        with app.test_client() as client:
+
+            vtt = client.get('/locals')
+            assert vtt.status == 200
+            assert json.loads(vtt.text) == {'tenant': 'acme',
+                                            'session': 'session-acme',
+                                            'quota': 'acme-quota',
+                                            'origin': 'quota'}
+
+    def test_first_failure(self, app):
+
+        with app.test_client() as client:
+
+            vtt = client.get('/failing')
+            assert vtt.status == 403
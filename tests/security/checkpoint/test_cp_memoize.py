@@ -0,0 +1,55 @@
+import json
+import pytest
+
+from hypr import Hypr, Provider, checkpoint, filter, request
+
+
+class Resource(Provider):
+
+    def get(self):
+        return request.m_filters
+
+
+class Root(Provider):
+
+    calls = 0
+
+    propagation_rules = {'propagate': Resource}
+
+    @checkpoint(memoize=True)
+    @filter('user', memoize=True)
+    def current_user(self, value):
+        Root.calls += 1
+        return 'user{}'.format(value)
+
+    def get(self, value):
+        return value
+
+
+@pytest.fixture(scope='class')
+def app():
+
+    app = Hypr()
+    app.router.add_provider(Root, '/<int:value>')
+    app.router.add_provider(Resource, '/resource')
+    app.propagate()
+    return app
+
+
+class TestMemoizedCheckpoint:
+
+    def test_once_per_request(self, app):
+
+        Root.calls = 0
+
+        with app.test_client() as client:
+
+            vtt = client.get('/1/resource')
+            assert vtt.status == 200
+            assert json.loads(vtt.text) == {'user': 'user1'}
+            assert Root.calls == 1
+
+            vtt = client.get('/2/resource')
+            assert vtt.status == 200
+            assert json.loads(vtt.text) == {'user': 'user2'}
+            assert Root.calls == 2
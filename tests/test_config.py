@@ -121,3 +121,18 @@ def test_get_namespace():
     assert 'bar stuff 1' == bar_options['BAR_STUFF_1']
     assert 'bar stuff 2' == bar_options['BAR_STUFF_2']
 
+
+def test_config_reload(tmpdir):
+    cfg = tmpdir.join('settings.cfg')
+    cfg.write('TEST_KEY = "foo"\n')
+
+    app = Hypr()
+    app.config.from_pyfile(str(cfg))
+    app.config['OTHER_KEY'] = 'bar'
+
+    cfg.write('TEST_KEY = "baz"\n')
+    app.config.reload()
+
+    assert app.config['TEST_KEY'] == 'baz'
+    assert app.config['OTHER_KEY'] == 'bar'
+    assert app.config.sources == [str(cfg)]
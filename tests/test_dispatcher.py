@@ -0,0 +1,362 @@
+import json
+import pytest
+from hypr import Hypr, Provider
+from hypr.dispatcher import Dispatcher, Rule, RuleNode
+
+
+@pytest.fixture(scope='class', params=Dispatcher.MODES)
+def app(request):
+
+    # the registration order matters, the rules are declared as a tuple
+
+    app = Hypr(router=Dispatcher(request.param))
+    for provider, *urls in request.cls.routes:
+        app.router.add_provider(provider, *urls)
+
+    app.propagate(lazy=getattr(request.cls, 'lazy', False))
+    return app
+
+
+class Echo(Provider):
+
+    def get(self, **kwargs):
+        return {'provider': self.name, 'args': kwargs}
+
+
+class ReadOnly(Echo):
+
+    methods = 'GET',
+
+
+class WriteOnly(Provider):
+
+    methods = 'POST',
+
+    def post(self):
+        return 'post'
+
+
+Files = type('Files', (Echo,), {})
+Items = type('Items', (Echo,), {})
+Pages = type('Pages', (Echo,), {})
+Ranges = type('Ranges', (Echo,), {})
+
+
+class TestRoutingTree:
+
+    routes = (
+        (Items, '/items/<int:id>', '/items/<name>/'),
+        (Files, '/files/f.<ext>', '/files/<path:path>/edit'),
+        (Ranges, '/ranges/<int:start>-<int:stop>'),
+        (Pages, '/pages/<path:page>'),
+    )
+
+    def test_typed_segment(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/items/12')
+            assert resp.status == 200
+            assert json.loads(resp.text) == {'provider': 'Items',
+                                             'args': {'id': 12}}
+
+    def test_untyped_segment_fallback(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/items/foo/')
+            assert resp.status == 200
+            assert json.loads(resp.text) == {'provider': 'Items',
+                                             'args': {'name': 'foo'}}
+
+    def test_redirect_non_leaf(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/items/foo', allow_redirects=False)
+            assert resp.status == 307
+
+    def test_mixed_segment(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/files/f.txt')
+            assert resp.status == 200
+            assert json.loads(resp.text)['args'] == {'ext': 'txt'}
+
+    def test_multiple_variables_segment(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/ranges/3-14')
+            assert resp.status == 200
+            assert json.loads(resp.text)['args'] == {'start': 3, 'stop': 14}
+
+            resp = client.get('/ranges/3-a')
+            assert resp.status == 404
+
+    def test_path_converter(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/pages/a/b/c')
+            assert resp.status == 200
+            assert json.loads(resp.text)['args'] == {'page': 'a/b/c'}
+
+            resp = client.get('/files/a/b/edit')
+            assert resp.status == 200
+            assert json.loads(resp.text)['args'] == {'path': 'a/b'}
+
+    def test_not_found(self, app):
+
+        with app.test_client() as client:
+            assert client.get('/items/12/foo').status == 404
+            assert client.get('/files/g.txt').status == 404
+            assert client.get('/pages').status == 404
+
+
+    def test_rule_not_compiled(self, app):
+
+        rule = Rule('/items/<int:id>')
+        assert rule._segments is None and not rule._greedy
+
+        with pytest.raises(ValueError) as exc:
+            RuleNode().insert(0, rule)
+        assert 'not compiled' in str(exc)
+
+
+class TestRoutingOrder:
+
+    routes = (
+        (ReadOnly, '/first/<value>', '/first/2'),
+        (WriteOnly, '/first/<int:value>'),
+    )
+
+    def test_registration_order(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/first/2')
+            assert resp.status == 200
+            assert json.loads(resp.text)['args'] == {'value': '2'}
+
+    def test_method_fallback(self, app):
+
+        with app.test_client() as client:
+            resp = client.post('/first/2')
+            assert resp.status == 200
+            assert json.loads(resp.text) == 'post'
+
+    def test_method_not_allowed(self, app):
+
+        with app.test_client() as client:
+            resp = client.post('/first/foo')
+            assert resp.status == 405
+
+            resp = client.put('/first/2')
+            assert resp.status == 405
+
+
+Health = type('Health', (Echo,), {})
+Users = type('Users', (Echo,), {})
+Named = type('Named', (Echo,), {})
+
+
+class TestStaticRules:
+
+    routes = (
+        (Named, '/named/<name>'),
+        (Health, '/health', '/named/health'),
+        (Users, '/users/'),
+    )
+
+    def test_static_rule(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/health')
+            assert resp.status == 200
+            assert json.loads(resp.text) == {'provider': 'Health', 'args': {}}
+
+    def test_static_redirect(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/users', allow_redirects=False)
+            assert resp.status == 307
+
+            resp = client.get('/users/')
+            assert resp.status == 200
+            assert json.loads(resp.text) == {'provider': 'Users', 'args': {}}
+
+    def test_static_rule_shadowed(self, app):
+
+        # a rule registered before the static one takes precedence
+        with app.test_client() as client:
+            resp = client.get('/named/health')
+            assert resp.status == 200
+            assert json.loads(resp.text) == {'provider': 'Named',
+                                             'args': {'name': 'health'}}
+
+    def test_static_method_not_allowed(self, app):
+
+        with app.test_client() as client:
+            resp = client.post('/health')
+            assert resp.status == 405
+
+
+class TestAlternations:
+
+    routes = tuple((type('R{}'.format(i), (Echo,), {}),
+                    '/r{}/<int:a>/<b>'.format(i)) for i in range(120))
+
+    def test_large_table(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/r119/1/x')
+            assert resp.status == 200
+            assert json.loads(resp.text) == {'provider': 'R119',
+                                             'args': {'a': 1, 'b': 'x'}}
+
+
+def test_unknown_mode():
+
+    with pytest.raises(ValueError):
+        Dispatcher('unknown')
+
+
+class TestResolutionCache:
+
+    routes = (
+        (Items, '/items/<int:id>'),
+    )
+
+    def test_cache(self, app):
+
+        app.config['DISPATCHER_CACHE_MAX'] = 2
+
+        with app.test_client() as client:
+            for _ in range(3):
+                resp = client.get('/items/1')
+                assert resp.status == 200
+                assert json.loads(resp.text)['args'] == {'id': 1}
+
+            assert app.router.cache_info() == (2, 1, 2, 1)
+
+            # errors are cached as well
+            assert client.get('/items/foo').status == 404
+            assert client.get('/items/foo').status == 404
+            assert client.post('/items/1').status == 405
+            assert client.post('/items/1').status == 405
+
+            assert app.router.cache_info() == (4, 3, 2, 2)
+
+    def test_cache_invalidation(self, app):
+
+        app.config['DISPATCHER_CACHE_MAX'] = 2
+
+        with app.test_client() as client:
+            assert client.get('/items/foo').status == 404
+            app.router.add_provider(Named, '/items/<name>')
+            assert app.router.cache_info().currsize == 0
+
+            resp = client.get('/items/foo')
+            assert resp.status == 200
+            assert json.loads(resp.text)['args'] == {'name': 'foo'}
+
+
+class TestAllowedMethods:
+
+    routes = (
+        (ReadOnly, '/shared/<int:value>'),
+        (WriteOnly, '/shared/<int:value>'),
+        (Named, '/shared/<name>'),
+    )
+
+    def test_method_not_allowed(self, app):
+
+        with app.test_client() as client:
+            resp = client.put('/shared/1')
+            assert resp.status == 405
+            assert resp.headers['ALLOW'] == 'GET,POST'
+
+            resp = client.delete('/shared/foo')
+            assert resp.status == 405
+            assert resp.headers['ALLOW'] == 'GET'
+
+    def test_options(self, app):
+
+        with app.test_client() as client:
+            resp = client.options('/shared/1')
+            assert resp.status == 200
+            assert resp.headers['ALLOW'] == 'GET,OPTIONS,POST'
+
+            resp = client.options('/unknown')
+            assert resp.status == 404
+
+
+class TestLazyPropagation:
+
+    lazy = True
+
+    prop_0 = type('prop_0', (Echo,), {})
+    prop_1 = type('prop_1', (Echo,), {})
+    prop_2 = type('prop_2', (Echo,), {})
+
+    prop_0.propagation_rules = {'next': prop_1}
+    prop_1.propagation_rules = {'next': prop_2, 'item': (prop_2, '/<int:id>')}
+    prop_2.propagation_rules = {'next': prop_0}
+
+    routes = (
+        (prop_0, '/res0'),
+        (prop_1, '/res1/'),
+        (prop_2, '/res2'),
+    )
+
+    def test_no_rule_generated(self, app):
+
+        assert sorted(app.router.iter_rules()) == ['/res0', '/res1/', '/res2']
+
+    def test_propagation(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/res0/res1/res2')
+            assert resp.status == 200
+            assert json.loads(resp.text)['provider'] == 'prop_2'
+
+            resp = client.get('/res0/res1/3')
+            assert resp.status == 200
+            assert json.loads(resp.text) == {
+                'provider': 'prop_2', 'args': {'id': 3}}
+
+            assert client.get('/res0/res2').status == 404
+
+        # only the rules reachable from /res0 have been generated
+        assert sorted(url for url in app.router.iter_rules()
+                      if not url.startswith('/res0')) == ['/res1/', '/res2']
+
+
+@pytest.mark.parametrize('mode', Dispatcher.MODES)
+def test_lazy_propagation_order(mode):
+
+    # the derived rules overlap, the first one is the same for both kinds of
+    # propagation (depth-first order of the propagation rules)
+
+    prop_a = type('prop_a', (Echo,), {})
+    prop_b = type('prop_b', (Echo,), {})
+    prop_c = type('prop_c', (Echo,), {})
+
+    prop_a.propagation_rules = {'b': (prop_b, '/c/<int:n>'), 'c': prop_c}
+    prop_b.propagation_rules = {'c': prop_c}
+
+    def resolve(app, path):
+        with app.test_client() as client:
+            resp = client.get(path)
+            return resp.status, json.loads(resp.text)
+
+    apps = []
+    for lazy in (True, False):
+        app = Hypr(router=Dispatcher(mode))
+        app.router.add_provider(prop_a, '/a/<x>')
+        app.router.add_provider(prop_b, '/b/<int:n>')
+        app.router.add_provider(prop_c, '/c/<path:p>')
+        app.propagate(lazy=lazy)
+        apps.append(app)
+
+    lazy, eager = apps
+    for path in ('/a/1/c/2/c/3', '/a/1/c/2', '/a/1/c/x/c/3', '/b/2/c/4'):
+        assert resolve(lazy, path) == resolve(eager, path)
+
+    assert resolve(lazy, '/a/1/c/2/c/3') == (200, {
+        'provider': 'prop_c', 'args': {'p': '3'}})
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+
+from hypr import Hypr
+from hypr.globals import LocalStorage, request, current_app
+
+
+@pytest.fixture(scope='module')
+def app():
+    return Hypr()
+
+
+def test_outside_of_a_task(app):
+
+    with pytest.raises(RuntimeError):
+        LocalStorage().set('value', 1)
+
+
+def test_request_proxy(app):
+
+    class Request:
+        method = 'GET'
+
+    @asyncio.coroutine
+    def task(value):
+        LocalStorage().set('request', value)
+        yield from asyncio.sleep(0)
+        return request.method, LocalStorage().get('request') is value
+
+    rv = app.loop.run_until_complete(asyncio.gather(task(Request()),
+                                                    task(Request())))
+    assert rv == [('GET', True), ('GET', True)]
+
+
+def test_storage(app):
+
+    @asyncio.coroutine
+    def task():
+        storage = LocalStorage()
+        storage.set('value', 1)
+        rv = storage.get('value')
+        storage.delete('value')
+        return rv, storage.get('value', None)
+
+    assert app.loop.run_until_complete(task()) == (1, None)
+    assert current_app.loop is app.loop
+
+
+def test_request_proxy_errors(app):
+
+    @asyncio.coroutine
+    def task():
+        with pytest.raises(KeyError):
+            request.method
+
+    app.loop.run_until_complete(task())
+
+    with pytest.raises(RuntimeError):
+        request.method
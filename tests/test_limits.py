@@ -0,0 +1,113 @@
+import asyncio
+import json
+import pytest
+
+from hypr import Hypr
+from hypr.limits import Limiter, acquire_all
+from test_tools import ProviderTemplate
+
+
+class Limited(ProviderTemplate):
+
+    max_concurrency = 1
+
+
+@pytest.fixture
+def app():
+
+    app = Hypr()
+    app.router.add_provider(Limited, '/limited')
+    app.router.add_provider(type('Free', (ProviderTemplate,), {}), '/free')
+    return app
+
+
+@pytest.fixture
+def loop(app):
+    return app.loop
+
+
+class TestLimiter:
+
+    def test_queue(self, loop):
+
+        limiter = Limiter(2, queue=1)
+        acquire = lambda: loop.create_task(limiter.acquire(loop))
+
+        tasks = [acquire() for _ in range(4)]
+        loop.run_until_complete(asyncio.sleep(0))
+
+        assert [t.done() for t in tasks] == [True, True, False, True]
+        assert tasks[3].result() is False
+        assert limiter.active == 2 and limiter.waiting == 1
+
+        limiter.release()
+        loop.run_until_complete(tasks[2])
+        assert limiter.active == 2 and limiter.waiting == 0
+
+        limiter.release()
+        limiter.release()
+        assert limiter.active == 0
+
+    def test_cancelled_waiter(self, loop):
+
+        limiter = Limiter(1, queue=None)
+        loop.run_until_complete(limiter.acquire(loop))
+
+        waiter = loop.create_task(limiter.acquire(loop))
+        loop.run_until_complete(asyncio.sleep(0))
+        waiter.cancel()
+        loop.run_until_complete(asyncio.sleep(0))
+
+        assert limiter.waiting == 0
+        limiter.release()
+        assert limiter.active == 0
+
+    def test_acquire_all(self, loop):
+
+        first, second = Limiter(1), Limiter(1)
+        loop.run_until_complete(second.acquire(loop))
+
+        rv = loop.run_until_complete(acquire_all([first, second], loop))
+        assert rv is None
+        assert first.active == 0
+
+
+class TestConcurrencyLimits:
+
+    def test_provider_limit(self, app, loop):
+
+        limiter = Limited.limiter()
+        loop.run_until_complete(limiter.acquire(loop))
+
+        with app.test_client() as client:
+
+            resp = client.get('/limited')
+            assert resp.status == 503
+            assert resp.headers['RETRY-AFTER'] == '1'
+
+            assert client.get('/free').status == 200
+
+            limiter.release()
+            resp = client.get('/limited')
+            assert resp.status == 200
+            assert json.loads(resp.text) == {'Limited': 'ok'}
+            assert limiter.active == 0
+
+    def test_global_limit(self, app, loop):
+
+        app.config['MAX_CONCURRENCY'] = 1
+        app.config['RETRY_AFTER'] = 5
+        loop.run_until_complete(app.limiter.acquire(loop))
+
+        with app.test_client() as client:
+
+            resp = client.get('/free')
+            assert resp.status == 503
+            assert resp.headers['RETRY-AFTER'] == '5'
+
+            # the slot of the provider isn't kept
+            assert client.get('/limited').status == 503
+            assert Limited.limiter().active == 0
+
+            app.limiter.release()
+            assert client.get('/free').status == 200
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import pytest
+
+from hypr import Hypr
+from test_tools import ProviderTemplate
+
+
+def middleware_factory(name, calls):
+
+    @asyncio.coroutine
+    def factory(app, handler):
+
+        calls.append(name)
+
+        @asyncio.coroutine
+        def middleware(request):
+            resp = yield from handler(request)
+            resp.headers['X-' + name] = 'on'
+            return resp
+
+        return middleware
+
+    return factory
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def app(calls):
+
+    app = Hypr(middlewares=[middleware_factory('First', calls)])
+    app.router.add_provider(type('Res0', (ProviderTemplate,), {}), '/res0')
+    app.router.add_provider(type('Res1', (ProviderTemplate,), {}), '/res1')
+    return app
+
+
+class TestMiddlewareChain:
+
+    def test_composed_once(self, app, calls):
+
+        with app.test_client() as client:
+
+            for _ in range(3):
+                resp = client.get('/res0')
+                assert resp.status == 200
+                assert json.loads(resp.text) == {'Res0': 'ok'}
+                assert resp.headers['X-FIRST'] == 'on'
+
+            assert calls == ['First']
+
+            client.get('/res1')
+            assert calls == ['First', 'First']
+
+    def test_middlewares_changed(self, app, calls):
+
+        with app.test_client() as client:
+
+            client.get('/res0')
+            app.middlewares.append(middleware_factory('Second', calls))
+
+            resp = client.get('/res0')
+            assert resp.headers['X-SECOND'] == 'on'
+            assert resp.headers['X-FIRST'] == 'on'
+            assert calls == ['First', 'Second', 'First']
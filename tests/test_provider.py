@@ -1,5 +1,5 @@
 import json
-from hypr import Provider
+from hypr import Provider, checkpoint, filter, request
 
 
 class MyProvider(Provider):
@@ -69,3 +69,167 @@ class TestProvider:
             assert resp.status == 200
             assert json.loads(resp.text) == {'another': 'foo', 'value': 1}
 
+
+def calls():
+    # the steps of the dispatch plan run by the request
+    return request.m_memo.setdefault('calls', [])
+
+
+class Target(Provider):
+
+    @checkpoint(scope=Provider.PATH)
+    def cp_path(self):
+        calls().append('Target.cp_path')
+
+    def get(self):
+        return calls() + ['Target.get']
+
+
+class Entry(Provider):
+
+    propagation_rules = {'next': Target}
+
+    @checkpoint(priority=20)
+    def cp_always(self):
+        calls().append('Entry.cp_always')
+
+    @checkpoint(scope=Provider.TRANSFER)
+    def cp_transfer(self):
+        calls().append('Entry.cp_transfer')
+
+    @checkpoint(methods='POST')
+    def cp_post(self):
+        calls().append('Entry.cp_post')
+
+    @filter('key')
+    def fltr(self):
+        calls().append('Entry.fltr')
+
+    def get(self):
+        return calls() + ['Entry.get']
+
+    def post(self):
+        return calls() + ['Entry.post']
+
+
+class TestDispatchPlan:
+
+    providers = {
+        Entry: '/entry',
+        Target: '/target',
+    }
+
+    def test_plan_entry(self, app):
+
+        with app.test_client() as client:
+
+            resp = client.get('/entry')
+
+            assert resp.status == 200
+            assert json.loads(resp.text) == ['Entry.cp_always', 'Entry.get']
+
+    def test_plan_propagation(self, app):
+
+        with app.test_client() as client:
+
+            resp = client.get('/entry/target')
+
+            assert resp.status == 200
+            assert json.loads(resp.text) == [
+                'Entry.cp_always',
+                'Entry.cp_transfer',
+                'Entry.fltr',
+                'Target.cp_path',
+                'Target.get',
+            ]
+
+    def test_plan_method(self, app):
+
+        with app.test_client() as client:
+
+            resp = client.post('/entry')
+
+            assert resp.status == 200
+            assert json.loads(resp.text) == [
+                'Entry.cp_post',
+                'Entry.cp_always',
+                'Entry.post',
+            ]
+
+    def test_plan_target(self, app):
+
+        # the PATH checkpoint only applies when the target is propagated
+        with app.test_client() as client:
+
+            resp = client.get('/target')
+
+            assert resp.status == 200
+            assert json.loads(resp.text) == ['Target.get']
+
+
+class Leaf(Provider):
+
+    @checkpoint(scope=Provider.PATH)
+    def cp_path(self, id, value=None):
+        calls().append(('Leaf.cp_path', id, value))
+
+    def get(self, **kwargs):
+        return {'calls': calls(), 'kwargs': kwargs}
+
+
+class Root(Provider):
+
+    propagation_rules = {'leaf': (Leaf, '/<int:id>')}
+
+    @checkpoint
+    def cp_none(self):
+        calls().append(('Root.cp_none',))
+
+    @checkpoint
+    def cp_id(self, id):
+        calls().append(('Root.cp_id', id))
+
+    @staticmethod
+    def get(id):
+        return {'calls': calls(), 'id': id}
+
+
+class TestCallArguments:
+
+    providers = {
+        Root: '/root/<int:id>',
+        Leaf: '/leaf/<int:id>',
+    }
+
+    def test_entry(self, app):
+
+        with app.test_client() as client:
+
+            resp = client.get('/root/1')
+
+            assert resp.status == 200
+            vtt = json.loads(resp.text)
+            assert sorted(vtt['calls']) == [['Root.cp_id', 1],
+                                            ['Root.cp_none']]
+            assert vtt['id'] == 1
+
+    def test_propagation(self, app):
+
+        # each provider of the path receives its own segments, unmangled
+        with app.test_client() as client:
+
+            resp = client.get('/root/1/2')
+
+            assert resp.status == 200
+            vtt = json.loads(resp.text)
+            assert vtt['calls'][-1] == ['Leaf.cp_path', 2, None]
+            assert vtt['kwargs'] == {'id': 2}
+
+    def test_repeated(self, app):
+
+        with app.test_client() as client:
+
+            for i in range(3):
+                resp = client.get('/leaf/{}'.format(i))
+                assert json.loads(resp.text) == {'calls': [],
+                                                 'kwargs': {'id': i}}
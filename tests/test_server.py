@@ -0,0 +1,399 @@
+import asyncio
+import http.client
+import os
+import signal
+import socket
+import threading
+import time
+import pytest
+
+import hypr.server
+
+from hypr import Hypr, Provider
+from hypr.globals import current_app
+from hypr.server import Prefork, bind_socket, drain_connections, \
+    new_event_loop
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+def test_bind_socket():
+
+    sock = bind_socket('127.0.0.1', 0)
+    try:
+        host, port = sock.getsockname()
+        assert host == '127.0.0.1'
+        assert sock.gettimeout() == 0.0
+    finally:
+        sock.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'),
+                    reason='SO_REUSEPORT is not supported')
+def test_bind_socket_reuse_port():
+
+    first = bind_socket('127.0.0.1', 0, reuse_port=True)
+    try:
+        _, port = first.getsockname()
+        second = bind_socket('127.0.0.1', port, reuse_port=True)
+        second.close()
+    finally:
+        first.close()
+
+
+def test_new_event_loop():
+
+    loop = new_event_loop('asyncio')
+    try:
+        assert isinstance(loop, asyncio.AbstractEventLoop)
+    finally:
+        loop.close()
+
+    with pytest.raises(ValueError):
+        new_event_loop('twisted')
+
+
+@pytest.mark.skipif(uvloop is not None, reason='uvloop is installed')
+def test_new_event_loop_fallback():
+
+    with pytest.raises(ImportError):
+        new_event_loop('uvloop')
+
+    loop = new_event_loop('auto')
+    try:
+        assert isinstance(loop, asyncio.AbstractEventLoop)
+    finally:
+        loop.close()
+
+
+def test_app_set_loop():
+
+    default = asyncio.get_event_loop()
+
+    # the loop supplied by the caller is left open
+    loop = asyncio.new_event_loop()
+    app = Hypr(loop=loop)
+    app._set_loop(new_event_loop())
+    assert app.loop is not loop and not loop.is_closed()
+    loop.close()
+
+    # the loops created by the application are closed when replaced
+    app = Hypr(loop='asyncio')
+    first = app.loop
+    app._set_loop(new_event_loop())
+    second = app.loop
+    app._set_loop(new_event_loop())
+    assert first.is_closed() and second.is_closed()
+    assert not app.loop.is_closed()
+    app.loop.close()
+
+    asyncio.set_event_loop(default)
+
+
+@pytest.mark.skipif(uvloop is None, reason='uvloop is not installed')
+def test_uvloop_app():
+
+    app = Hypr(loop='uvloop')
+    assert isinstance(app.loop, uvloop.Loop)
+    assert app._loop_name == 'uvloop'
+
+
+class BrokenPrefork(Prefork):
+
+    def init_worker(self):
+        raise RuntimeError('unable to boot')
+
+
+def test_prefork_boot_error():
+
+    app = Hypr()
+    pool = BrokenPrefork(app, '127.0.0.1', 0, 2, graceful_timeout=1)
+    pool.run()
+
+    assert pool.workers == {}
+    assert app._propagated
+
+
+def stub_serve(app, sock, graceful_timeout):
+
+    # Stands for a worker serving the application: announces it's ready
+    # (once able to stop gracefully) and waits for SIGTERM, ignored by the
+    # workers configured as STUCK.
+
+    stopping = []
+    if app.config.get('STUCK'):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    else:
+        signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    with open(os.path.join(app.config['READY_DIR'], str(os.getpid())), 'w'):
+        pass
+
+    while not stopping:
+        time.sleep(0.01)
+    return 2, 1
+
+
+class ScriptedPrefork(Prefork):
+
+    # Run a step of the script at each iteration of the supervision loop,
+    # until the step returns True. The pool is stopped if the script takes
+    # more than 10 seconds.
+
+    def __init__(self, *args, script, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.script = list(script)
+        self.deadline = time.monotonic() + 10
+
+    def _wait(self, timeout):
+
+        super()._wait(0.05)
+        if not self._running:
+            return
+        if time.monotonic() > self.deadline:
+            self._running = False
+        elif self.script and self.script[0](self):
+            self.script.pop(0)
+
+    def ready(self):
+
+        ready = set(os.listdir(self.app.config['READY_DIR']))
+        return len(self.workers) == self.num_workers and \
+            all(str(pid) in ready for pid in self.workers)
+
+
+@pytest.fixture
+def prefork_app(tmpdir, monkeypatch):
+
+    monkeypatch.setattr(hypr.server, 'serve', stub_serve)
+
+    app = Hypr()
+    app.config['READY_DIR'] = str(tmpdir.mkdir('ready'))
+    return app
+
+
+def test_prefork_restart_and_stop(prefork_app):
+
+    killed = []
+
+    def kill_worker(pool):
+        if not pool.ready():
+            return False
+        pid = next(iter(pool.workers))
+        os.kill(pid, signal.SIGKILL)
+        killed.append(pid)
+        return True
+
+    def restarted(pool):
+        return killed[0] not in pool.workers and pool.ready()
+
+    def terminate(pool):
+        os.kill(os.getpid(), signal.SIGTERM)
+        return True
+
+    pool = ScriptedPrefork(prefork_app, '127.0.0.1', 0, 2,
+                           graceful_timeout=2,
+                           script=[kill_worker, restarted, terminate])
+    pool.run()
+
+    assert pool.script == []
+    assert pool.workers == {} and pool.retiring == {}
+
+    # the killed worker doesn't report, the others stopped gracefully
+    assert (pool.drained, pool.aborted) == (4, 2)
+
+
+def test_prefork_restart_interval(prefork_app):
+
+    killed, started = [], []
+
+    def kill_worker(pool):
+        if not pool.ready():
+            return False
+        pid = min(pool.workers, key=pool.workers.get)
+        os.kill(pid, signal.SIGKILL)
+        killed.append(pid)
+        return True
+
+    def restarted(pool):
+        if killed[-1] in pool.workers or not pool.ready():
+            return False
+        started.append(max(pool.workers.values()))
+        return True
+
+    def terminate(pool):
+        os.kill(os.getpid(), signal.SIGTERM)
+        return True
+
+    pool = ScriptedPrefork(prefork_app, '127.0.0.1', 0, 2,
+                           graceful_timeout=2, restart_interval=0.5,
+                           script=[kill_worker, restarted, kill_worker,
+                                   restarted, terminate])
+    pool.run()
+
+    assert pool.script == []
+
+    # a worker crashing right after the previous restart isn't replaced at
+    # once
+    assert started[1] - started[0] >= 0.5
+
+
+def test_prefork_reload(prefork_app, tmpdir):
+
+    cfg = tmpdir.join('settings.cfg')
+    cfg.write('STUCK = True\n')
+    prefork_app.config.from_pyfile(str(cfg))
+
+    generations = []
+
+    def reload_broken(pool):
+        if not pool.ready():
+            return False
+        generations.append(set(pool.workers))
+        cfg.write('STUCK = (\n')
+        os.kill(os.getpid(), signal.SIGHUP)
+        return True
+
+    def reload(pool):
+        # the current workers are kept
+        assert pool.reloads == 0
+        assert set(pool.workers) == generations[0] and pool.retiring == {}
+        cfg.write('STUCK = False\n')
+        os.kill(os.getpid(), signal.SIGHUP)
+        return True
+
+    def reloaded(pool):
+        if not (pool.reloads == 1 and pool.ready()):
+            return False
+        generations.append(set(pool.workers))
+        assert set(pool.retiring) <= generations[0]
+        return True
+
+    def overdue(pool):
+        # the previous workers ignore SIGTERM, they're killed after the
+        # graceful timeout
+        if pool.retiring:
+            return False
+        os.kill(os.getpid(), signal.SIGTERM)
+        return True
+
+    pool = ScriptedPrefork(prefork_app, '127.0.0.1', 0, 2,
+                           graceful_timeout=0.5,
+                           script=[reload_broken, reload, reloaded, overdue])
+    pool.run()
+
+    assert pool.script == []
+    assert pool.reloads == 1
+    assert not generations[0] & generations[1]
+    assert pool.workers == {} and pool.retiring == {}
+
+    # only the workers of the second generation stopped gracefully
+    assert (pool.drained, pool.aborted) == (4, 2)
+
+
+class Sleeper(Provider):
+
+    @asyncio.coroutine
+    def get(self, delay):
+        # announce the request is in-flight before sleeping `delay` ms
+        path = os.path.join(current_app.config['READY_DIR'], str(delay))
+        with open(path, 'w'):
+            pass
+        yield from asyncio.sleep(delay / 1000)
+        return 'ok'
+
+
+def test_prefork_serve(tmpdir):
+
+    app = Hypr()
+    app.config['READY_DIR'] = str(tmpdir.mkdir('ready'))
+    app.router.add_provider(Sleeper, '/sleep/<int:delay>')
+
+    responses = {}
+
+    def fetch(port, delay):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        try:
+            conn.request('GET', '/sleep/{}'.format(delay))
+            resp = conn.getresponse()
+            responses[delay] = resp.status, resp.read()
+        except (http.client.HTTPException, OSError) as exc:
+            responses[delay] = exc
+        finally:
+            conn.close()
+
+    clients = []
+
+    def send(pool):
+        if not pool.workers:
+            return False
+        port = pool.sock.getsockname()[1]
+        for delay in (300, 5000):
+            clients.append(threading.Thread(target=fetch, args=(port, delay)))
+            clients[-1].start()
+        return True
+
+    def terminate(pool):
+        # both requests are in-flight
+        if len(os.listdir(app.config['READY_DIR'])) < 2:
+            return False
+        os.kill(os.getpid(), signal.SIGTERM)
+        return True
+
+    pool = ScriptedPrefork(app, '127.0.0.1', 0, 1, graceful_timeout=1,
+                           script=[send, terminate])
+    pool.run()
+
+    for client in clients:
+        client.join()
+
+    assert pool.script == []
+
+    # the short request completes, the long one is aborted after the
+    # graceful timeout
+    assert responses[300] == (200, b'"ok"')
+    assert not isinstance(responses[5000], tuple)
+    assert (pool.drained, pool.aborted) == (1, 1)
+
+
+class Connection:
+
+    def __init__(self, factory, busy):
+        self.factory = factory
+        self.busy = busy
+
+    def closing(self, timeout):
+        if not self.busy:
+            self.factory.lost(self)
+
+
+class HandlerFactory:
+
+    def __init__(self, idle, busy):
+        self._connections = [Connection(self, False) for _ in range(idle)] + \
+                            [Connection(self, True) for _ in range(busy)]
+
+    @property
+    def connections(self):
+        return list(self._connections)
+
+    def lost(self, conn):
+        self._connections.remove(conn)
+
+    @asyncio.coroutine
+    def finish_connections(self, timeout=None):
+        self._connections.clear()
+
+
+def test_drain_connections():
+
+    app = Hypr()
+    factory = HandlerFactory(idle=3, busy=2)
+
+    rv = app.loop.run_until_complete(drain_connections(factory, 0.1))
+
+    assert rv == (3, 2)
+    assert factory.connections == []
@@ -0,0 +1,99 @@
+import pytest
+
+from hypr import Hypr, Provider, checkpoint, filter
+from hypr.timing import Timings, NO_TIMINGS
+from test_tools import ProviderTemplate
+
+
+class Parent(Provider):
+
+    propagation_rules = {'child': ('Child', '/child')}
+
+    @checkpoint()
+    def allowed(self):
+        pass
+
+    @filter(scope='child', key='parent')
+    def parent_filter(self, parent_id):
+        return parent_id
+
+    def get(self):
+        return {'parent': 'ok'}
+
+
+@pytest.fixture
+def app():
+
+    app = Hypr()
+    app.router.add_provider(type('Child', (ProviderTemplate,), {}), '/child')
+    app.router.add_provider(Parent, '/parent', '/parent/<int:parent_id>')
+    app.propagate()
+    return app
+
+
+def test_timings():
+
+    timings = Timings()
+    with timings.measure('resolve'):
+        pass
+    with timings.measure('checkpoint', ('auth', 'quota'), Parent):
+        pass
+
+    assert [t[:2] for t in timings] == [('resolve', None),
+                                        ('checkpoint', 'Parent.auth+quota')]
+    assert all(t[2] >= 0 for t in timings)
+
+    resolve, cp = timings.header().split(', ')
+    assert resolve.startswith('resolve;dur=')
+    assert cp.startswith('checkpoint;dur=')
+    assert cp.endswith(';desc="Parent.auth+quota"')
+
+
+def test_no_timings():
+
+    with NO_TIMINGS.measure('resolve'):
+        pass
+
+    assert not NO_TIMINGS.enabled
+    assert len(NO_TIMINGS) == 0
+
+
+class TestTimingHooks:
+
+    def test_disabled(self, app):
+
+        with app.test_client() as client:
+            resp = client.get('/parent')
+            assert resp.status == 200
+            assert 'SERVER-TIMING' not in resp.headers
+
+    def test_hook(self, app):
+
+        recorded = []
+
+        @app.timing_hook
+        def hook(request, timings):
+            recorded.append([t[:2] for t in timings])
+
+        with app.test_client() as client:
+            resp = client.get('/parent/1/child')
+            assert resp.status == 200
+
+        assert recorded == [[('resolve', None),
+                             ('checkpoint', 'Parent.allowed'),
+                             ('filter', 'Parent.parent_filter'),
+                             ('handler', 'Child.get'),
+                             ('serialize', None),
+                             ('write', None)]]
+
+    def test_server_timing(self, app):
+
+        app.config['SERVER_TIMING'] = True
+
+        with app.test_client() as client:
+            resp = client.get('/parent')
+            assert resp.status == 200
+
+            stages = [m.split(';')[0]
+                      for m in resp.headers['SERVER-TIMING'].split(', ')]
+            assert stages == ['resolve', 'checkpoint', 'handler', 'serialize']